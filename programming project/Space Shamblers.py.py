@@ -1,5 +1,16 @@
 # 1. IMPORTS & INITIALISATION                                                 
+import time; _T0 = time.perf_counter()         # process start stamp (for --startup-bench)
 import pygame, sys, os, random, math            # core libraries: graphics/audio, system exit, file ops, RNG, trig
+import numpy as np                              # vectorised projectile arrays
+import argparse, hashlib, mmap                  # command‑line switches, cache keys, mapped cache reads
+import atexit, csv, json                        # flushing & formatting profiler exports
+import weakref                                  # per‑surface caches that die with their surface
+import gc, tracemalloc                          # leak hunting & memory peaks (--telemetry, --soak, --bench)
+from collections import OrderedDict, namedtuple, deque  # LRU cache, lightweight records, rolling windows
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor  # asset decoding threads, batch workers
+if (any(a.startswith(("--headless", "--bench", "--replay", "--batch", "--soak")) for a in sys.argv)  # no window/audio
+        and "--replay-realtime" not in sys.argv):                                   # device needed
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy"); os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
 pygame.init()                                    # initialise Pygame’s video subsystem
 pygame.mixer.init()                              # initialise Pygame’s audio mixer
 
@@ -7,7 +18,11 @@ pygame.mixer.init()                              # initialise Pygame’s audio m
 # 2. GLOBAL CONFIGURATION CONSTANTS                                           
 
 WIDTH, HEIGHT, FPS = 1200, 900, 60              # window resolution and target frames‑per‑second
-PLAYER_SPEED, LASER_SPEED, ENEMY_LASER = 5, 7, 4 # movement speed & projectile velocities
+LOGIC_HZ, MAX_CATCHUP = 120, 8                  # fixed simulation rate & most logic steps run per frame
+STEP_MS = 1000 / LOGIC_HZ                       # length of one logic step in ms
+PLAYER_SPEED, LASER_SPEED, ENEMY_LASER = 300, 420, 240  # movement speed & projectile velocities (px/s)
+ORB_SPEED, ZIGZAG_SPEED = 180, 60               # boss homing‑orb & type‑2 enemy speed (px/s)
+FLASH_MS, FLASH_STEPS = 120, 6                  # hit‑flash length & pre‑built brightness levels
 
 DIFFS = ["Easy", "Normal", "Hard"]              # ordered list of difficulty names
 diff_idx = 0                                    # index into DIFFS (0=Easy)
@@ -39,6 +54,43 @@ SCHEMES = [
 ]
 scheme_idx = 0                                  # active control‑scheme index
 
+# Command‑line switches (unknown ones are ignored so IDE "Run" buttons keep working)
+_cli = argparse.ArgumentParser(description="Space Shamblers")
+_cli.add_argument("--startup-bench", action="store_true",
+                  help="print the time to first frame and exit")
+_cli.add_argument("--full-flip", action="store_true",
+                  help="redraw and flip the whole window every frame instead of only changed areas")
+_cli.add_argument("--profile-out", metavar="FILE",
+                  help="stream per‑frame phase timings to FILE (.csv, otherwise JSON lines)")
+_cli.add_argument("--headless", type=int, metavar="TICKS", default=0,
+                  help="run TICKS simulation ticks with a scripted bot, no window, then exit")
+_cli.add_argument("--bench", action="store_true",
+                  help="run the headless benchmark scenarios and compare them with the baseline file")
+_cli.add_argument("--bench-save", action="store_true",
+                  help="with --bench: store this run as the new baseline")
+_cli.add_argument("--bench-threshold", type=float, default=0.15, metavar="FRACTION",
+                  help="with --bench: fail if throughput drops more than this below baseline (default 0.15)")
+_cli.add_argument("--record", metavar="FILE",
+                  help="save every game's seed and per‑tick inputs to FILE (one JSON line per game)")
+_cli.add_argument("--replay", metavar="FILE",
+                  help="play back the games in a --record FILE as fast as possible, no window, then exit")
+_cli.add_argument("--replay-realtime", action="store_true",
+                  help="with --replay: show the games in the window at normal speed instead")
+_cli.add_argument("--batch", type=int, metavar="GAMES", default=0,
+                  help="play GAMES bot games per difficulty on every CPU core and report balance statistics")
+_cli.add_argument("--batch-out", metavar="FILE",
+                  help="with --batch: also write the statistics to FILE (.csv, otherwise JSON)")
+_cli.add_argument("--render-scale", type=float, default=1.0, metavar="FRACTION",
+                  help="draw at FRACTION of the native resolution (e.g. 0.5 or 0.75) and let the GPU "
+                       "stretch it to the window – for slow machines")
+_cli.add_argument("--telemetry", metavar="FILE",
+                  help="append entity counts, surface count and memory use to FILE (JSON lines) every 30 s")
+_cli.add_argument("--soak", type=float, metavar="MINUTES", default=0,
+                  help="play and restart bot games headless for MINUTES, failing if memory or tick time grows")
+_cli.add_argument("--low-latency", action="store_true",
+                  help="vsync the window, pace frames precisely and read input just before each update")
+ARGS, _ = _cli.parse_known_args()
+
 
 # 3. HANDY RGB COLOUR CONSTANTS                                               
 
@@ -49,116 +101,414 @@ YELL=(255,255,0); MAG=(255,0,255); PURP=(128,0,128); GRAY=(100,100,100)
 
 # 4. DISPLAY OBJECTS & TEXT UTILITIES                                         
 
-screen = pygame.display.set_mode((WIDTH, HEIGHT))   # create the main window surface
+RENDER_SCALE = min(1.0, max(0.25, ARGS.render_scale))   # internal resolution / native resolution
+
+class ScaledScreen:
+    """Stand‑in for the display surface when drawing below native resolution (--render-scale);
+    takes game coordinates, shrinks each source once (cached) and lets SDL stretch the frame back up."""
+    def __init__(self, surf, scale):
+        self.surf, self.scale = surf, scale
+        self._small = weakref.WeakKeyDictionary()      # source Surface → shrunk copy
+
+    def shrink(self, src):
+        small = self._small.get(src)
+        if small is None:
+            w, h = src.get_size()
+            size = (max(1, round(w * self.scale)), max(1, round(h * self.scale)))
+            resize = pygame.transform.smoothscale if src.get_bitsize() in (24, 32) else pygame.transform.scale
+            small = self._small[src] = resize(src, size)
+        a = src.get_alpha()
+        if a != small.get_alpha(): small.set_alpha(a)  # follow fades set on the source
+        return small
+
+    def to_display(self, r):
+        s, r = self.scale, pygame.Rect(r)
+        x, y = math.floor(r.left * s), math.floor(r.top * s)
+        return pygame.Rect(x, y, math.ceil(r.right * s) - x, math.ceil(r.bottom * s) - y)
+
+    def to_game(self, r):
+        s = self.scale
+        x, y = math.floor(r.left / s), math.floor(r.top / s)
+        return pygame.Rect(x, y, math.ceil(r.right / s) - x, math.ceil(r.bottom / s) - y)
+
+    def blit(self, src, dest, area=None, special_flags=0):
+        s = self.scale
+        pos = (math.floor(dest[0] * s), math.floor(dest[1] * s))   # same rounding as to_display
+        return self.to_game(self.surf.blit(self.shrink(src), pos,
+                                           area and self.to_display(area), special_flags))
+
+    def blits(self, seq, doreturn=True):
+        s, shrink, floor = self.scale, self.shrink, math.floor
+        small = [(shrink(it[0]), (floor(it[1][0] * s), floor(it[1][1] * s)))
+                 + ((self.to_display(it[2]),) if len(it) > 2 else ()) for it in seq]
+        out = self.surf.blits(small, doreturn)            # one call into SDL for the whole batch
+        return [self.to_game(r) for r in out] if doreturn else None
+
+def fit_window():
+    """Give a SCALED window the native WIDTH×HEIGHT size (pygame picks a whole multiple of the surface)."""
+    try:
+        from pygame._sdl2.video import Window
+        Window.from_display_module().size = (WIDTH, HEIGHT)
+    except (ImportError, pygame.error) as e:
+        print("[WARN] window not resized:", e)
+
+def open_window(size, flags=0):
+    """Create the display surface; with --low-latency a vsynced SCALED one if the driver allows it."""
+    global VSYNC
+    if ARGS.low_latency:
+        try:
+            surf = pygame.display.set_mode(size, flags | pygame.SCALED, vsync=1)   # SDL only vsyncs SCALED/GL
+            VSYNC = True; fit_window(); return surf
+        except pygame.error as e:
+            print(f"[LATENCY] vsync unavailable ({e}) – using the frame limiter only")
+    surf = pygame.display.set_mode(size, flags)
+    if flags & pygame.SCALED: fit_window()
+    return surf
+
+VSYNC = False                                         # a vsynced window was granted (--low-latency)
+if RENDER_SCALE < 1:
+    screen = ScaledScreen(open_window((round(WIDTH * RENDER_SCALE), round(HEIGHT * RENDER_SCALE)),
+                                      pygame.SCALED), RENDER_SCALE)
+else:
+    screen = open_window((WIDTH, HEIGHT))               # create the main window surface
 pygame.display.set_caption("Space Shamblers")       # window title text
 clock  = pygame.time.Clock()                        # helper to cap frame‑rate
+
+def game_pos(pos):
+    """Mouse position *pos* in game coordinates (the window may be drawn at --render-scale)."""
+    return pos if RENDER_SCALE == 1 else (int(pos[0] / RENDER_SCALE), int(pos[1] / RENDER_SCALE))
 Font   = pygame.font.SysFont                        # alias for font factory
 
+TEXT_CACHE_MAX = 128                                # rendered labels kept before LRU eviction
+_fonts = {}                                         # size → Font object (built once per size)
+_texts = OrderedDict()                              # (text, size, colour) → rendered Surface
+
+def font(size):
+    """Return the shared Font for *size*, creating it on first use."""
+    f = _fonts.get(size)
+    if f is None:
+        f = _fonts[size] = Font(None, size)
+    return f
+
+def text_surf(text, size, color=WHITE):
+    """Return a cached rendered label, re‑rendering only on a cache miss."""
+    key  = (text, size, color)
+    surf = _texts.get(key)
+    if surf is None:
+        surf = _texts[key] = font(size).render(text, True, color)
+        if len(_texts) > TEXT_CACHE_MAX:            # drop the least recently used label
+            _texts.popitem(last=False)
+    else:
+        _texts.move_to_end(key)                     # mark as recently used
+    return surf
+
 def blit_mid(text, y, size=36, color=WHITE, alpha=255):
-    """Render *text* centred horizontally at vertical pos *y*."""
-    surf = Font(None, size).render(text, True, color)  # create text surface
+    """Render *text* centred horizontally at vertical pos *y*; return the area drawn."""
+    surf = text_surf(text, size, color)                # cached text surface
     surf.set_alpha(alpha)                              # apply transparency (for fades)
-    screen.blit(surf, ((WIDTH - surf.get_width()) // 2, y))  # draw centred
+    return screen.blit(surf, ((WIDTH - surf.get_width()) // 2, y))  # draw centred
 
 def fit(button, pad=24, min_w=120):
     """Resize a Button’s rect so its label never clips."""
-    w = Font(None, 30).size(button.txt)[0] + pad       # desired width incl. padding
+    w = font(30).size(button.txt)[0] + pad             # desired width incl. padding
     button.rect.w = max(min_w, w)                      # enforce minimum width
 
 
 # 5. GENERIC ASSET‑LOADING HELPERS                                            
 
 ASSET_DIR = "assets"                              # root folder for all art & audio
+_index    = None                                  # stem → path, built by the first lookup
+_loader   = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 2))  # decode/scale workers
 
 def _find(stem):
-    """Search *ASSET_DIR* recursively for a file whose stem matches *stem*."""
-    stem = stem.lower()                             # case‑insensitive search
-    for root, _, files in os.walk(ASSET_DIR):       # walk directory tree
-        for f in files:
-            if os.path.splitext(f)[0].lower() == stem:   # compare stems
-                return os.path.join(root, f)             # return full path
-    return None                                         # not found
+    """Return the path in *ASSET_DIR* whose stem matches *stem* (or None)."""
+    global _index
+    if _index is None:                              # scan the tree once, then O(1) lookups
+        _index = {}
+        for root, _, files in os.walk(ASSET_DIR):
+            for f in files:                         # first match wins, as with a linear search
+                _index.setdefault(os.path.splitext(f)[0].lower(), os.path.join(root, f))
+    return _index.get(stem.lower())                 # case‑insensitive lookup
+
+CACHE_DIR = ".asset_cache"                        # pre‑scaled pixel data (safe to delete)
+
+def _cache_file(path, size, fmt):
+    """Cache filename for *path* scaled to *size*; changes whenever the source is edited."""
+    key = f"{os.path.abspath(path)}|{os.stat(path).st_mtime_ns}|{size[0]}x{size[1]}|{fmt}"
+    return os.path.join(CACHE_DIR, hashlib.sha1(key.encode()).hexdigest() + ".raw")
+
+def _decode(path, size, fmt):
+    """Worker: return *path* scaled to *size*, from the raw cache when possible."""
+    cached = _cache_file(path, size, fmt)
+    try:                                            # hit → map the pixels, no PNG decode/scale
+        with open(cached, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(buf) == size[0] * size[1] * len(fmt):
+            return pygame.image.frombuffer(buf, size, fmt)
+    except (OSError, ValueError):
+        pass                                        # missing/empty/truncated → rebuild below
+    img = pygame.image.load(path)
+    if img.get_size() != size and img.get_bitsize() in (24, 32):   # smoothscale needs 24/32‑bit
+        img = pygame.transform.smoothscale(img, size)
+    if img.get_size() == size:                      # store for next launch (atomic replace)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp = f"{cached}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(pygame.image.tobytes(img, fmt))
+            os.replace(tmp, cached)
+        except OSError as e:
+            print("[WARN] asset cache not written:", e)
+    return img
+
+def load_images(*specs):
+    """Load & scale (stem, size, fallback_col[, opaque]) images in parallel; return Surfaces in order."""
+    jobs = [_submit_image(*spec) for spec in specs]     # queue every decode first…
+    return [_collect_image(job) for job in jobs]        # …then collect on the main thread
+
+def _submit_image(stem, size, col, opaque=False):
+    """Start decoding one image spec on a worker; return the job to hand to _collect_image."""
+    path = _find(stem)
+    fmt  = "RGB" if opaque else "RGBA"
+    return stem, size, col, opaque, path, path and _loader.submit(_decode, path, size, fmt)
 
-def load_image(stem, size, fallback_col=(255,0,0)):
-    """Load & scale an image, else return a coloured rectangle surface."""
-    path = _find(stem)                                  # locate file
-    if path:
+def _collect_image(job):
+    """Wait for a _submit_image job and return its display‑converted Surface (or a fallback)."""
+    stem, size, col, opaque, path, job = job
+    if job:
         try:
-            img = pygame.image.load(path).convert_alpha()   # load image w/ alpha
-            if img.get_size() != size:                      # scale if needed
+            img = job.result()                          # display conversion stays on main thread
+            img = img.convert() if opaque else img.convert_alpha()   # opaque: no per-pixel alpha, SDL copies it fast
+            if img.get_size() != size:                  # e.g. palette images skipped by worker
                 img = pygame.transform.smoothscale(img, size)
             return img
         except Exception as e:
-            print("[WARN] bad image:", path, e)         # invalid file logged
+            print("[WARN] bad image:", path, e)     # invalid file logged
     # fallback if missing or failed
-    surf = pygame.Surface(size, pygame.SRCALPHA); surf.fill(fallback_col)
+    surf = pygame.Surface(size) if opaque else pygame.Surface(size, pygame.SRCALPHA)
+    surf.fill(col)
     print(f"[WARN] fallback for {stem}")
     return surf
 
-def load_sound(stem):
-    """Return a Sound object or None if missing/invalid."""
+def load_image(stem, size, fallback_col=(255,0,0)):
+    """Load & scale an image, else return a coloured rectangle surface."""
+    return load_images((stem, size, fallback_col))[0]
+
+def load_sounds(*stems):
+    """Decode several sounds in parallel; each entry is a Sound or None if missing/invalid."""
+    jobs = [_submit_sound(stem) for stem in stems]
+    return [_collect_sound(job) for job in jobs]
+
+def _submit_sound(stem):
     path = _find(stem)
-    if path:
+    return stem, path, path and _loader.submit(pygame.mixer.Sound, path)
+
+def _collect_sound(job):
+    stem, path, job = job
+    if job:
         try:
-            return pygame.mixer.Sound(path)
+            return job.result()
         except Exception as e:
             print("[WARN] sound bad:", path, e)
     print(f"[WARN] no sound for {stem}")
     return None
 
+def load_sound(stem):
+    """Return a Sound object or None if missing/invalid."""
+    return load_sounds(stem)[0]
+
+class Lazy:
+    """Handle to an asset that is decoded on first use – or ahead of time on a worker thread
+    with prefetch() – and can be dropped again with evict() to free its memory."""
+    def __init__(self, submit, collect):
+        self.submit, self.collect = submit, collect    # start a decode job / turn it into the asset
+        self.job   = None                              # decode in flight
+        self.value = None
+        self.ready = False                             # value is loaded (it may legitimately be None)
+
+    def prefetch(self):
+        if not self.ready and self.job is None:
+            self.job = self.submit()
+
+    def get(self):
+        """The asset, waiting for (or starting) its decode if necessary."""
+        if not self.ready:
+            self.prefetch()
+            self.value, self.ready, self.job = self.collect(self.job), True, None
+        return self.value
+
+    def evict(self):
+        self.job, self.value, self.ready = None, None, False
+
+def lazy_image(*spec):
+    """Lazy version of load_image for a (stem, size, fallback_col[, opaque]) spec."""
+    return Lazy(lambda: _submit_image(*spec), _collect_image)
+
+def music_path(stem):
+    """Path of a music track to stream (or None if missing) – never decoded up front."""
+    path = _find(stem)
+    if not path: print(f"[WARN] no music for {stem}")
+    return path
+
 
 # 6. LOAD IMAGE RESOURCES                                                     
 
-img_player = load_image("main character", (50, 50), BLUE)      # protagonist sprite
-img_e1     = load_image("enemy 1",        (40, 40), RED)       # enemy type‑1 sprite
-img_e2     = load_image("enemy 2",        (40, 40), GREEN)     # enemy type‑2 sprite
-img_boss   = load_image("enemy 3 design", (120,60), PURP)      # boss sprite
-img_heart  = load_image("heart",          (20, 20), RED)       # UI heart icon
+_t_assets = time.perf_counter()                    # start of asset decoding (for --startup-bench)
+(img_player,                                        # protagonist sprite
+ img_e1,                                            # enemy type‑1 sprite
+ img_e2,                                            # enemy type‑2 sprite
+ img_boss,                                          # boss sprite
+ img_heart,                                         # UI heart icon
+ bg_menu) = load_images(                            # menu background
+    ("main character", (50, 50), BLUE),
+    ("enemy 1",        (40, 40), RED),
+    ("enemy 2",        (40, 40), GREEN),
+    ("enemy 3 design", (120,60), PURP),
+    ("heart",          (20, 20), RED),
+    ("main menu back ground", (WIDTH, HEIGHT), BLACK, True))
+stage_bg = {st: lazy_image(f"stage {st} back ground", (WIDTH, HEIGHT), BLACK, True)   # stage 1‑3 backdrops,
+            for st in (1, 2, 3)}                                                   # loaded by want_assets()
+
+class EffectCache:
+    """Hit‑flash variants of sprites, built once at load time (FLASH_STEPS brightened copies each)."""
+    def __init__(self, steps=FLASH_STEPS):
+        self.steps = steps
+        self.ramps = {}                              # sprite → brightened copies, faintest first
+
+    def add(self, img, colour=WHITE, peak=180):
+        """Pre‑build *img*'s flash ramp, tinted towards *colour* by up to *peak* (0…255)."""
+        ramp = []
+        for k in range(1, self.steps + 1):
+            f = peak * k / self.steps / 255
+            v = img.copy()
+            v.fill([int(c * f) for c in colour], special_flags=pygame.BLEND_RGB_ADD)
+            ramp.append(v)
+        self.ramps[img] = ramp
+
+    def flash(self, img, left):
+        """*img* as it should look with *left* ms of its flash to go (plain *img* once it is over)."""
+        ramp = self.ramps.get(img)
+        if left <= 0 or not ramp:
+            return img
+        return ramp[min(self.steps, math.ceil(left * self.steps / FLASH_MS)) - 1]
 
-bg_menu = load_image("main menu back ground", (WIDTH, HEIGHT), BLACK)  # menu background
-bg1     = load_image("stage 1 back ground",   (WIDTH, HEIGHT), BLACK)  # stage 1 backdrop
-bg2     = load_image("stage 2 back ground",   (WIDTH, HEIGHT), BLACK)  # stage 2 backdrop
-bg3     = load_image("stage 3 back ground",   (WIDTH, HEIGHT), BLACK)  # stage 3 backdrop
+effects = EffectCache()
+for _img in (img_player, img_e1, img_e2, img_boss):
+    effects.add(_img)
 
 
 # 7. LOAD AUDIO RESOURCES                                                     
 
-menu_music   = _find("main menu ost")             # path to menu music file
-pause_music  = _find("pause menu ost")            # music during pause/settings
-gameover_music = _find("game over menu")          # music for victory/defeat
-stage_music  = {                                   # per‑stage background tracks
-    1: _find("stage 1"),
-    2: _find("stage 2"),
-    3: _find("stage 3")
-}
-
-snd_click  = load_sound("button click")            # UI click SFX
-snd_deathE = load_sound("death sound (enemies)")   # enemy destroyed SFX
-snd_deathP = load_sound("death sound")             # player destroyed SFX
-snd_e12    = load_sound("enemies shooting sound (1,2)")  # shot from type 1/2
-snd_boss   = load_sound("enemy 3 shooting sound")  # boss shot SFX
-snd_power  = load_sound("power ups sound")         # power‑up acquired SFX
-
-
-# Music helpers
-muted = False                                      # global mute flag
-
-def play_music(path, loop=-1):
-    """Play *path* on the music channel (looping) unless muted/None."""
-    pygame.mixer.music.stop()                      # stop anything currently playing
-    if not muted and path:
-        pygame.mixer.music.load(path)
-        pygame.mixer.music.play(loop)
-
-def ensure_music(path):
-    """Restart *path* if it has stopped unintentionally."""
-    if not muted and path and not pygame.mixer.music.get_busy():
-        play_music(path)
+(snd_click,                                         # UI click SFX
+ snd_deathE,                                        # enemy destroyed SFX
+ snd_deathP,                                        # player destroyed SFX
+ snd_e12,                                           # shot from type 1/2
+ snd_boss,                                          # boss shot SFX
+ snd_power) = load_sounds(                          # power‑up acquired SFX
+    "button click", "death sound (enemies)", "death sound",
+    "enemies shooting sound (1,2)", "enemy 3 shooting sound", "power ups sound")
+
+menu_music     = music_path("main menu ost")        # main menu track
+pause_music    = music_path("pause menu ost")       # music during pause/settings
+gameover_music = music_path("game over menu")       # music for victory/defeat
+stage_music    = {st: music_path(f"stage {st}") for st in (1, 2, 3)}   # per‑stage background tracks
+_t_assets = time.perf_counter() - _t_assets         # total asset decode time (seconds)
+
+def want_assets(stage=None):
+    """Prefetch the backgrounds *stage* (None in the menus) can lead to next and evict the rest."""
+    keep = {1} if stage is None else {1, stage, stage + 1}   # stage 1: start / restart
+    for st in (1, 2, 3):
+        if st in keep: stage_bg[st].prefetch()
+        else:          stage_bg[st].evict()
+
+want_assets()                                      # stage 1 decodes while the logo and menu show
+
+
+# Audio manager
+SFX_CHANNELS = {"ui": 2, "shots": 6, "events": 4}   # mixer channels reserved per sound category
+COALESCE_MS  = 30                                   # repeats of one sound within this window are dropped
+FADE_MS      = 400                                  # music fade length
+
+class Audio:
+    """Sound effects on pooled channels per SFX_CHANNELS category and music streamed through pygame.mixer.music."""
+    def __init__(self, pools=SFX_CHANNELS):
+        total = sum(pools.values())
+        pygame.mixer.set_num_channels(total)
+        pygame.mixer.set_reserved(total)             # nothing outside this manager grabs our channels
+        ids = iter(range(total))
+        self.pools = {cat: [pygame.mixer.Channel(next(ids)) for _ in range(n)] for cat, n in pools.items()}
+        self.last  = {}                              # Sound → tick it last started
+        self.muted = False
+        self.track = None                            # path of the current music
+        self.start = 0.0                             # position (s) the current track was started at
+        self.held  = None                            # (track, position in s) remembered by hold=True
+
+    def play(self, sound, cat="events"):
+        """Start *sound* on a channel of *cat* unless muted, missing or just played."""
+        if self.muted or not sound:
+            return
+        now = pygame.time.get_ticks()
+        if now - self.last.get(sound, -COALESCE_MS) < COALESCE_MS:
+            return                                   # identical sound this frame – one is enough
+        self.last[sound] = now
+        pool = self.pools[cat]
+        ch = next((c for c in pool if not c.get_busy()), pool[0])   # idle channel, else the oldest
+        pool.remove(ch); pool.append(ch)             # most recently started goes last
+        ch.play(sound)
+
+    def music(self, track, hold=False, resume=False):
+        """Make *track* (a path or None) the music; *hold* keeps the old one's place for a later *resume*."""
+        if track == self.track:
+            return
+        mus = pygame.mixer.music
+        held, self.held = self.held, None
+        if hold and self.track:
+            self.held = (self.track, self.start + max(0, mus.get_pos()) / 1000)
+        self.track, self.start = track, 0.0
+        if resume and held and held[0] == track:
+            self.start = held[1]
+        if not track:
+            mus.fadeout(FADE_MS) if mus.get_busy() else mus.stop()
+        elif mus.get_busy() and not self.start:      # fade the old track out, the new one follows
+            mus.fadeout(FADE_MS); mus.queue(track, loops=-1)
+        else:                                        # silence, muted or resuming: switch at once
+            mus.stop()                               # drops any queued track (load() over one crashes)
+            mus.load(track)
+            try:
+                mus.play(-1, start=self.start, fade_ms=0 if self.muted else FADE_MS)
+            except pygame.error:                     # held past the end of the track
+                self.start = 0.0; mus.play(-1)
+            if self.muted: mus.pause()               # keep its place for when sound comes back
+
+    def set_muted(self, muted):
+        """Silence (or restore) everything; music picks up where it was paused."""
+        self.muted = muted
+        for ch in [c for pool in self.pools.values() for c in pool]:
+            ch.stop()                                # effects just end
+        (pygame.mixer.music.pause if muted else pygame.mixer.music.unpause)()
+
+audio = Audio()
+
+def present(rects=None):
+    """Push the finished frame (or only *rects* of it) to the window (ends a --startup-bench run);
+    return the area of the profiler overlay drawn on top, else None."""
+    box = prof.draw() if prof.visible else None
+    pacer.presenting()
+    if rects is None: pygame.display.flip()
+    else:
+        rects = rects + [box] if box else rects
+        pygame.display.update(rects if RENDER_SCALE == 1 else [screen.to_display(r) for r in rects])
+    pacer.presented()
+    prof.mark("present")
+    if ARGS.startup_bench:
+        print(f"[BENCH] first frame after {(time.perf_counter()-_T0)*1000:.1f} ms "
+              f"(assets {_t_assets*1000:.1f} ms)")
+        pygame.quit(); sys.exit()
+    return box
 
 def click():
     """Play the button click sound (respecting mute)."""
-    if not muted and snd_click:
-        snd_click.play()
+    audio.play(snd_click, "ui")
 
 
 # 8. BUTTON CLASS (UI WIDGET)                                                 
@@ -168,12 +518,18 @@ class Button:
     def __init__(self, txt, x, y, w, h):
         self.rect = pygame.Rect(x, y, w, h)        # clickable rectangle
         self.txt  = txt                            # label text
+        self._img_key = None                       # (text, size) the cached image was drawn for
+        self._img     = None                       # cached box + label surface
     def draw(self):
-        pygame.draw.rect(screen, GRAY, self.rect, border_radius=4)       # draw box
-        lab = Font(None, 30).render(self.txt, True, WHITE)               # render label
-        screen.blit(lab, (
-            self.rect.x + (self.rect.w - lab.get_width()) // 2,          # centre X
-            self.rect.y + (self.rect.h - lab.get_height()) // 2))        # centre Y
+        """Draw the button; return its on‑screen area."""
+        if self._img_key != (self.txt, self.rect.size):                 # label/size changed → redraw once
+            img = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+            pygame.draw.rect(img, GRAY, img.get_rect(), border_radius=4)  # box
+            lab = font(30).render(self.txt, True, WHITE)
+            img.blit(lab, ((self.rect.w - lab.get_width()) // 2,          # centre X
+                           (self.rect.h - lab.get_height()) // 2))        # centre Y
+            self._img, self._img_key = img, (self.txt, self.rect.size)
+        return screen.blit(self._img, self.rect)
     def hit(self, pos):
         """Return True if *pos* (x,y) collides with the button."""
         return self.rect.collidepoint(pos)
@@ -205,368 +561,1424 @@ menu_btn   = Button("Menu",   WIDTH//2-60, HEIGHT//2+60,  120, 40)
 quit_game  = Button("Quit",   WIDTH//2-60, HEIGHT//2+120, 120, 40)
 
 
-#10. ENTITY CLASSES – PLAYER & ENEMY                                          
+#10. FRAME PROFILER (F3 OVERLAY & EXPORT)                                     
+
+def percentile(values, q):
+    """*q*‑th percentile (0…100) of *values* by nearest rank; 0 for an empty sequence."""
+    v = sorted(values)
+    return v[min(len(v) - 1, int(len(v) * q / 100))] if v else 0.0
+
+class FrameProfiler:
+    """Always‑on per‑phase frame timer with a live overlay and optional file export;
+    mark(phase) charges the time since the previous mark to *phase*."""
+    PHASES = ("wait", "events", "player", "projectiles", "enemies", "collisions",
+              "stage", "draw", "hud", "present")
+
+    def __init__(self, out_path=None, window=300):
+        self.visible = False                       # overlay shown (toggled with F3)
+        self.frames  = deque(maxlen=window)        # recent whole‑frame times (ms)
+        self.recent  = {p: deque(maxlen=window) for p in self.PHASES}  # recent per‑phase times (ms)
+        self.cur     = dict.fromkeys(self.PHASES, 0.0)                 # phases of the frame in progress
+        self.counts  = (0, 0)                      # enemies & projectiles at the end of the last frame
+        self._t = self._t0 = time.perf_counter()   # last mark / start of the current frame
+        self._n = 0                                # frames recorded
+        self._skip = False                         # frame in progress is not to be recorded
+        self._panel, self._panel_due = None, 0.0   # cached overlay surface & when to rebuild it
+        self._file = self._csv = None
+        if out_path:
+            self._file = open(out_path, "w", newline="")
+            if out_path.lower().endswith(".csv"):
+                self._csv = csv.writer(self._file)
+                self._csv.writerow(("frame", "t_ms", "frame_ms") + self.PHASES + ("enemy_count", "projectile_count"))
+            atexit.register(self.close)
+
+    def mark(self, phase):
+        t = time.perf_counter()
+        self.cur[phase] += (t - self._t) * 1000
+        self._t = t
+
+    def frame(self, enemies=0, projectiles=0):
+        """Close the frame in progress (recording it unless discarded) and start the next one."""
+        t = time.perf_counter()
+        if not self._skip:
+            self._record(t, enemies, projectiles)
+        self.cur = dict.fromkeys(self.PHASES, 0.0)
+        self._t = self._t0 = t
+        self._skip = False
+
+    def discard(self):
+        """Don't record the frame in progress (it slept on a static screen)."""
+        self._skip = True
+
+    def _record(self, t, enemies, projectiles):
+        total = (t - self._t0) * 1000
+        self.frames.append(total)
+        for p, v in self.cur.items():
+            self.recent[p].append(v)
+        self.counts = (enemies, projectiles)
+        if self._file:
+            if self._csv:
+                self._csv.writerow([self._n, round((self._t0 - _T0) * 1000, 3), round(total, 3)]
+                                   + [round(self.cur[p], 3) for p in self.PHASES] + [enemies, projectiles])
+            else:
+                self._file.write(json.dumps({"frame": self._n, "t_ms": round((self._t0 - _T0) * 1000, 3),
+                                             "frame_ms": round(total, 3),
+                                             **{p: round(v, 3) for p, v in self.cur.items()},
+                                             "enemy_count": enemies, "projectile_count": projectiles}) + "\n")
+        self._n += 1
+
+    def close(self):
+        if self._file:
+            self._file.close(); self._file = self._csv = None
+
+    def _render(self):
+        ft = self.frames
+        mean = sum(ft) / len(ft) if ft else 0.0
+        lines = [f"FPS {1000 / mean if mean else 0:5.1f}   frame p50 {percentile(ft, 50):5.2f}"
+                 f"  p95 {percentile(ft, 95):5.2f}  p99 {percentile(ft, 99):5.2f} ms"]
+        for p in self.PHASES:
+            r = self.recent[p]
+            lines.append(f"{p:<12}{sum(r) / len(r) if r else 0:6.2f} ms   max {max(r, default=0):6.2f}")
+        lines.append(f"enemies {self.counts[0]}   projectiles {self.counts[1]}")
+        lines.append(pacer.summary())
+        labs  = [font(22).render(l, True, WHITE) for l in lines]
+        panel = pygame.Surface((max(l.get_width() for l in labs) + 16, len(labs) * 18 + 12), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        for i, l in enumerate(labs):
+            panel.blit(l, (8, 6 + i * 18))
+        return panel
+
+    def draw(self):
+        """Blit the overlay (rebuilt 4× a second) in the top‑right corner; return its area."""
+        now = time.perf_counter()
+        if self._panel is None or now >= self._panel_due:
+            self._panel, self._panel_due = self._render(), now + 0.25
+        return screen.blit(self._panel, (WIDTH - self._panel.get_width() - 10, 80))
+
+prof = FrameProfiler(ARGS.profile_out)              # shared by the main loop and GameSimulation.step
+
+SPIN_S = 0.002                                     # last stretch of a frame wait is spun, not slept
+
+class FramePacer:
+    """Input‑to‑present latency and frame‑interval meter, plus the --low‑latency frame limiter (wait())."""
+    MARGIN_S = 0.002                               # safety gap before the refresh (vsync mode)
+
+    def __init__(self, fps, vsync, window=600):
+        rates = getattr(pygame.display, "get_desktop_refresh_rates", lambda: [])()
+        hz = rates[0] if vsync and rates and rates[0] > 0 else fps
+        self.period  = 1 / hz                      # target time between presents (s)
+        self.vsync   = vsync
+        self.latency = deque(maxlen=window)        # input sample → frame on screen (ms)
+        self.interval= deque(maxlen=window)        # present → present (ms)
+        self.work    = deque(maxlen=120)           # input sample → start of the swap (s)
+        self._input = self._swap = self._shown = None
+        self._start = time.perf_counter()          # start of the frame in progress
+
+    def wait(self):
+        """Hold the next frame until it is due; return the ms since the last frame started."""
+        now = time.perf_counter()
+        if self.vsync and self._shown is not None:   # never sooner than a refresh after the last start,
+            due = max(self._shown + self.period - percentile(self.work, 95),   # in case the driver
+                      self._start + self.period) - self.MARGIN_S                 # ignores vsync
+        else:
+            due = self._start + self.period
+        if due - now > SPIN_S:
+            time.sleep(due - now - SPIN_S)
+        while time.perf_counter() < due:
+            pass
+        t = time.perf_counter()
+        dt = (t - self._start) * 1000
+        # keep a steady grid unless far behind (load, window drag) – then don't race to catch up
+        self._start = t if self.vsync or t - due > self.period else due
+        return dt
+
+    def resync(self):
+        """Forget the current rhythm (after an idle sleep on a static screen)."""
+        self._start, self._shown, self._input = time.perf_counter(), None, None
+
+    def input_sampled(self):
+        self._input = time.perf_counter()
+
+    def presenting(self):
+        self._swap = time.perf_counter()
+
+    def presented(self):
+        t = time.perf_counter()
+        if self._input is not None:
+            self.latency.append((t - self._input) * 1000)
+            self.work.append(self._swap - self._input)
+            self._input = None
+        if self._shown is not None:
+            self.interval.append((t - self._shown) * 1000)
+        self._shown = t
+
+    def summary(self):
+        lat, iv = self.latency, self.interval
+        mean = sum(iv) / len(iv) if iv else 0.0
+        jitter = math.sqrt(sum((v - mean) ** 2 for v in iv) / len(iv)) if iv else 0.0
+        return (f"input→present p50 {percentile(lat, 50):5.2f}  p95 {percentile(lat, 95):5.2f} ms   "
+                f"interval {mean:5.2f} ± {jitter:4.2f} ms")
+
+    def report(self):
+        if self.interval:
+            print(f"[LATENCY] {'vsync' if self.vsync else 'no vsync'}, {len(self.interval)} frames – {self.summary()}")
+
+pacer = FramePacer(FPS, VSYNC)                     # fed by present() and the main loop
+
+
+#11. SPATIAL INDEX (COLLISION BROAD PHASE)                                   
+
+GRID_CELL = 80                                    # grid cell size in px (≈ enemy spacing in spawn)
+
+class SpatialHash:
+    """Uniform grid that buckets objects by the cells their rect overlaps (re‑bucketed only on crossing one)."""
+    def __init__(self, cell=GRID_CELL):
+        self.cell  = cell                          # cell edge length in px
+        self.cells = {}                            # (cx, cy) → list of objects
+        self.span  = {}                            # object → (x0, y0, x1, y1) cell range it occupies
+
+    def _range(self, r):
+        c = self.cell
+        return r.left // c, r.top // c, (r.right - 1) // c, (r.bottom - 1) // c
+
+    def insert(self, obj, rect):
+        x0, y0, x1, y1 = self.span[obj] = self._range(rect)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                self.cells.setdefault((cx, cy), []).append(obj)
+
+    def remove(self, obj):
+        x0, y0, x1, y1 = self.span.pop(obj)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                self.cells[(cx, cy)].remove(obj)   # cells hold a handful of objects at most
+
+    def update(self, obj, rect):
+        """Re‑bucket *obj* only if its rect now covers different cells."""
+        if self.span.get(obj) != self._range(rect):
+            self.remove(obj); self.insert(obj, rect)
+
+    def clear(self):
+        self.cells.clear(); self.span.clear()
+
+    def query(self, rect):
+        """Return the objects in the cells *rect* overlaps (candidates, not confirmed hits)."""
+        x0, y0, x1, y1 = self._range(rect)
+        if x0 == x1 and y0 == y1:                  # common case: one cell, no de‑duplication needed
+            return self.cells.get((x0, y0), ())
+        found, seen = [], set()
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                for obj in self.cells.get((cx, cy), ()):
+                    if id(obj) not in seen:
+                        seen.add(id(obj)); found.append(obj)
+        return found
+
+
+#12. PROJECTILE POOL (STRUCT‑OF‑ARRAYS)                                      
+
+OWNER_PLAYER, OWNER_ENEMY, OWNER_BOSS = 0, 1, 2   # who fired a projectile (also picks its look)
+
+def _shot_surfaces():
+    """Pre‑render each owner's projectile once (indexed by OWNER_*) so drawing is just blits."""
+    lasers = [pygame.Surface((4, 10)).convert() for _ in range(2)]
+    lasers[0].fill(YELL); lasers[1].fill(RED)                          # player / enemy laser
+    orb = pygame.Surface((12, 12), pygame.SRCALPHA)
+    pygame.draw.circle(orb, MAG, (6, 6), 6)                          # boss orb
+    return (*lasers, orb.convert_alpha())
+
+SHOT_IMG = _shot_surfaces()
+
+class ProjectilePool:
+    """Every projectile in flight, stored as parallel NumPy arrays with recycled slots."""
+    FIELDS = (("x", np.float32), ("y", np.float32),    # top‑left corner
+              ("px", np.float32), ("py", np.float32),  # position before the last step (for interpolation)
+              ("vx", np.float32), ("vy", np.float32),  # velocity (px per second)
+              ("w", np.float32), ("h", np.float32),    # hit‑box size
+              ("owner", np.int8), ("dmg", np.int16),   # OWNER_* and damage dealt
+              ("alive", np.bool_))                     # slot in use
+
+    def __init__(self, capacity=256):
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype))
+        self.free = list(range(capacity - 1, -1, -1))   # stack of unused slots (lowest on top)
+
+    def __len__(self):
+        return len(self.x) - len(self.free)
+
+    def _grow(self):
+        n = len(self.x)
+        for name, _ in self.FIELDS:
+            arr = getattr(self, name)
+            setattr(self, name, np.concatenate([arr, np.zeros_like(arr)]))
+        self.free[:0] = range(2 * n - 1, n - 1, -1)     # keep the old free slots on top
+
+    def spawn(self, x, y, vx, vy, w, h, owner, dmg=1):
+        if not self.free:
+            self._grow()
+        i = self.free.pop()
+        self.x[i] = self.px[i] = x; self.y[i] = self.py[i] = y
+        self.vx[i], self.vy[i] = vx, vy
+        self.w[i], self.h[i], self.owner[i], self.dmg[i] = w, h, owner, dmg
+        self.alive[i] = True
+        return i
+
+    def release(self, idx):
+        """Return the slots in the index array *idx* to the free list."""
+        self.alive[idx] = False
+        self.free.extend(idx.tolist())
+
+    def clear(self, owner=None):
+        """Drop every projectile (or only those fired by *owner*)."""
+        mask = self.alive if owner is None else self.alive & (self.owner == owner)
+        self.release(np.flatnonzero(mask))
+
+    def step(self, dt):
+        """Move every projectile by *dt* ms and free the ones that have left the screen."""
+        self.px[:] = self.x; self.py[:] = self.y
+        k = dt / 1000
+        self.x += self.vx * k; self.y += self.vy * k       # dead slots move too – cheaper than masking
+        x, y = self.x, self.y
+        gone = self.alive & ((x + self.w < 0) | (x > WIDTH) | (y + self.h < 0) | (y > HEIGHT))
+        if gone.any():
+            self.release(np.flatnonzero(gone))
+
+    def overlapping(self, rect, hostile):
+        """Indices of live projectiles overlapping *rect*, fired by enemies if *hostile* else by the player."""
+        x, y = self.x, self.y
+        mask = (self.alive & ((self.owner != OWNER_PLAYER) if hostile else (self.owner == OWNER_PLAYER))
+                & (x < rect.right) & (x + self.w > rect.left) & (y < rect.bottom) & (y + self.h > rect.top))
+        return np.flatnonzero(mask)
+
+    def active(self, owner):
+        return np.flatnonzero(self.alive & (self.owner == owner))
+
+    def blit_items(self, alpha=1.0):
+        """(surface, position) pairs for every live projectile *alpha* of the way through the last step."""
+        i = np.flatnonzero(self.alive)
+        xs = lerp(self.px[i], self.x[i], alpha).astype(int).tolist()    # whole pool interpolated at once
+        ys = lerp(self.py[i], self.y[i], alpha).astype(int).tolist()
+        return [(SHOT_IMG[o], (x, y)) for o, x, y in zip(self.owner[i].tolist(), xs, ys)]
+
+
+#13. ENTITY CLASSES – PLAYER & ENEMY                                          
+
+def lerp(a, b, t):
+    """Linear interpolation: *a* at t=0, *b* at t=1 (used for smooth drawing between logic steps)."""
+    return a + (b - a) * t
+
+Inputs = namedtuple("Inputs", "left right up down shoot")   # one tick of player controls
+NO_INPUT = Inputs(False, False, False, False, False)
+
+def read_inputs(keys):
+    """Translate a pygame key state into Inputs using the active control scheme."""
+    sc = SCHEMES[scheme_idx]                                              # current control scheme mapping
+    return Inputs(keys[sc["left"]], keys[sc["right"]], keys[sc["up"]], keys[sc["down"]], keys[sc["shoot"]])
 
 class Player:
     """Handles player sprite, movement, shooting and health."""
-    def __init__(self):
+    __slots__ = ("img", "rect", "x", "y", "px", "py", "speed", "hearts", "cool", "last", "flash_until")
+
+    def __init__(self, difficulty):
         self.img   = img_player                                           # sprite image
-        self.rect  = self.img.get_rect(midbottom=(WIDTH//2, HEIGHT-90))   # starting position
-        self.speed = PLAYER_SPEED                                         # movement speed
+        self.rect  = self.img.get_rect(midbottom=(WIDTH//2, HEIGHT-90))   # starting position (hit‑box)
+        self.x, self.y   = float(self.rect.x), float(self.rect.y)         # exact position (sub‑pixel)
+        self.px, self.py = self.x, self.y                                 # position before the last step
+        self.speed = PLAYER_SPEED                                         # movement speed (px/s)
         self.hearts= START_HEARTS[difficulty]                             # life points
         self.cool  = 1000                                                 # cooldown (ms) between shots
-        self.last  = 0                                                    # time of last shot
-        self.lasers= []                                                   # active player lasers (list of Rects)
+        self.last  = -self.cool                                           # time of last shot (ready at once)
         self.flash_until = 0                                              # time until which sprite flashes white
 
-    def move(self, keys):
-        sc = SCHEMES[scheme_idx]                                          # current control scheme mapping
-        if keys[sc["left"]]  and self.rect.left  > 0:             self.rect.x -= self.speed
-        if keys[sc["right"]] and self.rect.right < WIDTH:         self.rect.x += self.speed
-        if keys[sc["up"]]    and self.rect.top   > HEIGHT-250:    self.rect.y -= self.speed
-        if keys[sc["down"]]  and self.rect.bottom< HEIGHT:         self.rect.y += self.speed
-
-    def shoot(self):
-        """Spawn a new laser if enough time has elapsed."""
-        if pygame.time.get_ticks() - self.last >= self.cool:
-            self.lasers.append(pygame.Rect(self.rect.centerx-2, self.rect.top, 4, 10))
-            self.last = pygame.time.get_ticks()
-
-    def draw(self):
-        # flash white overlay if recently hit
-        if pygame.time.get_ticks() < self.flash_until:
-            tint = pygame.Surface(self.img.get_size(), pygame.SRCALPHA)
-            tint.fill((255, 255, 255, 180))                               # semi‑transparent white
-            screen.blit(self.img, self.rect); screen.blit(tint, self.rect)
-        else:
-            screen.blit(self.img, self.rect)
-        # draw every laser
-        for l in self.lasers:
-            pygame.draw.rect(screen, YELL, l)
+    def move(self, inp, dt):
+        """Move for *dt* ms according to *inp*, staying inside the lower play area."""
+        self.px, self.py = self.x, self.y
+        d, w, h = self.speed * dt / 1000, self.rect.w, self.rect.h
+        if inp.left:  self.x = max(0,          self.x - d)
+        if inp.right: self.x = min(WIDTH - w,  self.x + d)
+        if inp.up:    self.y = max(HEIGHT-250, self.y - d)
+        if inp.down:  self.y = min(HEIGHT - h, self.y + d)
+        self.rect.topleft = (round(self.x), round(self.y))
+
+    def shoot(self, now, shots):
+        """Spawn a new laser in the *shots* pool if enough time has elapsed."""
+        if now - self.last >= self.cool:
+            shots.spawn(self.rect.centerx-2, self.rect.top, 0, -LASER_SPEED, 4, 10, OWNER_PLAYER)
+            self.last = now
+
+    def blit_item(self, now, alpha=1.0):
+        """(surface, position) of the sprite *alpha* of the way through the last step
+        (flashing white if recently hit)."""
+        pos = (round(lerp(self.px, self.x, alpha)), round(lerp(self.py, self.y, alpha)))
+        return (effects.flash(self.img, self.flash_until - now), pos)
 
 class Enemy:
     """Base class for all enemy types (1, 2, boss=3)."""
-    def __init__(self, x, y, t):
+    __slots__ = ("t", "img", "rect", "x", "px", "hp", "dmg", "dir", "delay", "last", "flash_until", "idx")
+
+    def __init__(self, x, y, t, difficulty):
+        self.rect = pygame.Rect(0, 0, 0, 0)                               # position (hit‑box), reused
+        self.reset(x, y, t, difficulty)
+
+    def reset(self, x, y, t, difficulty):
+        """(Re)initialise as a fresh type‑*t* enemy at (*x*, *y*) – used when a pooled enemy is reused."""
         self.t    = t                                                    # enemy type
         self.img  = img_e1 if t==1 else img_e2 if t==2 else img_boss      # choose sprite
-        self.rect = self.img.get_rect(topleft=(x, y))                     # position
+        self.rect.size = self.img.get_size(); self.rect.topleft = (x, y)
+        self.x = self.px = float(x)                                      # exact x now & before the last step
         self.hp   = HP_TABLE[difficulty][t]                               # hit points
         self.dmg  = 1 if t==1 else 2 if t==2 else 3                       # damage inflicted
         self.dir  = 1                                                    # horizontal direction (type 2 zig‑zag)
-        self.lasers = []                                                 # active enemy projectiles
-        self.last   = 0                                                  # last shot time
         self.delay  = 1000 if t!=3 else 3000                              # cooldown between shots (boss slower)
+        self.last   = -self.delay                                        # last shot time (ready at once)
+        self.flash_until = 0                                             # time until which sprite flashes white
+        self.idx  = -1                                                   # position in its wave's list
 
-    def move(self, group):
-        """Only type 2 moves horizontally (zig‑zag)."""
+    def move(self, grid, dt):
+        """Only type 2 moves horizontally (zig‑zag) for *dt* ms; *grid* indexes the wave."""
+        self.px = self.x
         if self.t == 2:
-            nxt = self.rect.move(self.dir, 0)
-            # bounce off edges or other enemies
+            x   = self.x + self.dir * ZIGZAG_SPEED * dt / 1000
+            nxt = self.rect.move(round(x) - self.rect.x + self.dir, 0)   # probe one pixel ahead
+            # bounce off edges or other enemies (neighbours come from the spatial index)
             if (nxt.left <= 0 or nxt.right >= WIDTH or
-                any(o is not self and nxt.colliderect(o.rect) for o in group)):
+                any(o is not self and nxt.colliderect(o.rect) for o in grid.query(nxt))):
                 self.dir *= -1
             else:
-                self.rect = nxt
-
-    def shoot(self, target):
-        """Different shooting logic per enemy type."""
-        if pygame.time.get_ticks() - self.last < self.delay:
-            return  # not yet ready
+                self.x = x; self.rect.x = round(x); grid.update(self, self.rect)
+
+    def shoot(self, target, now, shots, rng):
+        """Different shooting logic per enemy type (into the *shots* pool, chance from *rng*);
+        return True if fired."""
+        if now - self.last < self.delay:
+            return False  # not yet ready
+        fired = True
         if self.t == 3:
             # boss – shoot a homing orb (circle with velocity components)
             dx, dy = target.centerx - self.rect.centerx, target.centery - self.rect.centery
             dist   = max(1, math.hypot(dx, dy))
-            self.lasers.append([self.rect.centerx, self.rect.bottom, dx/dist*3, dy/dist*3])
-            if not muted and snd_boss: snd_boss.play()
+            shots.spawn(self.rect.centerx-6, self.rect.bottom-6, dx/dist*ORB_SPEED, dy/dist*ORB_SPEED,
+                        12, 12, OWNER_BOSS, self.dmg)
         else:
             chance = 0.05 if self.t == 2 else 0.1                       # type 2 shoots less frequently
-            if random.random() < chance:
-                self.lasers.append(pygame.Rect(self.rect.centerx, self.rect.bottom, 4, 10))
-                if not muted and snd_e12: snd_e12.play()
-        self.last = pygame.time.get_ticks()                              # reset cooldown timer
+            fired  = rng.random() < chance
+            if fired:
+                shots.spawn(self.rect.centerx, self.rect.bottom, 0, ENEMY_LASER, 4, 10, OWNER_ENEMY, self.dmg)
+        self.last = now                                                  # reset cooldown timer
+        return fired
 
-    def draw(self):
-        screen.blit(self.img, self.rect)                                 # sprite
-        for l in self.lasers:
-            if self.t == 3:
-                pygame.draw.circle(screen, MAG, (int(l[0]), int(l[1])), 6)  # boss orb
-            else:
-                pygame.draw.rect(screen, RED, l)                          # linear laser
+    def blit_item(self, now, alpha=1.0):
+        img = effects.flash(self.img, self.flash_until - now)           # flashes white when hit
+        return (img, (round(lerp(self.px, self.x, alpha)), self.rect.y))
+
+
+class EnemyPool:
+    """Keeps killed and cleared enemies for reuse, so waves and restarts don't allocate new ones."""
+    def __init__(self):
+        self.spare = []                                                  # released Enemy objects
+
+    def get(self, x, y, t, difficulty):
+        if not self.spare:
+            return Enemy(x, y, t, difficulty)
+        en = self.spare.pop(); en.reset(x, y, t, difficulty)
+        return en
+
+    def release(self, enemies):
+        self.spare.extend(enemies)
 
+enemy_pool = EnemyPool()                          # shared by spawn(), formation() and GameSimulation
 
-#11. FUNCTION TO BUILD WAVES / STAGES                                         
 
+#14. FUNCTION TO BUILD WAVES / STAGES                                         
 
-def spawn(stage):
+
+def spawn(stage, difficulty):
     """Return a list of Enemy objects appropriate for *stage* (1…3)."""
     e  = []                                       # resulting list
+    new = enemy_pool.get                          # recycled Enemy objects
     cx = WIDTH // 2                               # horizontal centre
     if stage == 1:                                # basic grid (24 foes)
         for r in range(4):                        # 4 rows
             for c in range(6):                    # 6 columns
-                e.append(Enemy(cx-240+c*80, 110+r*60, 1))
+                e.append(new(cx-240+c*80, 110+r*60, 1, difficulty))
     elif stage == 2:                              # mix of types 1 & 2
         mid = cx - 160
         for r in range(4):
             y = 110 + r*60
-            e.append(Enemy(mid-80,  y, 2)); e.append(Enemy(mid+320, y, 2))
+            e.append(new(mid-80,  y, 2, difficulty)); e.append(new(mid+320, y, 2, difficulty))
             for c in range(4):                    # inner type‑1s
-                e.append(Enemy(mid+c*80, y, 1))
+                e.append(new(mid+c*80, y, 1, difficulty))
     else:                                         # stage 3 – boss + escorts
         mid = cx - 160
         for r in range(4):
             y = 110 + r*60
-            e.append(Enemy(mid-80,  y, 2)); e.append(Enemy(mid+320, y, 2))
-            e.append(Enemy(mid-40,  y, 1)); e.append(Enemy(mid+280, y, 1))
-        boss = Enemy(cx-60, 200, 3); e.append(boss)                     # central boss
+            e.append(new(mid-80,  y, 2, difficulty)); e.append(new(mid+320, y, 2, difficulty))
+            e.append(new(mid-40,  y, 1, difficulty)); e.append(new(mid+280, y, 1, difficulty))
+        boss = new(cx-60, 200, 3, difficulty); e.append(boss)         # central boss
         for i in range(6):                                               # extra minions under boss
-            e.append(Enemy(cx-200+i*80, boss.rect.bottom+70, 1))
+            e.append(new(cx-200+i*80, boss.rect.bottom+70, 1, difficulty))
     return e
 
-
-#12. HIGH‑LEVEL STATE VARIABLES                                              
-
-state = "logo"                                   # current top‑level screen
-logo_start = pygame.time.get_ticks()              # timestamp for splash fade
-
-player  = Player()                                # single player instance
-enemies = spawn(1)                                # initial wave (stage 1)
-stage   = 1                                       # stage index
-
-start_time  = pygame.time.get_ticks()             # game timer baseline
-paused_time = 0                                   # total pause duration
-pause_start = None                                # timestamp when pause started
-
-ability_msg  = None                               # power‑up banner text
-ability_time = 0                                  # time banner appeared
-
-#13. MAIN LOOP                                                                
-while True:
-    dt  = clock.tick(FPS)                         # delay to keep FPS; also yields delta time (unused)
-    now = pygame.time.get_ticks()                 # current time in ms
-
-    #  EVENT HANDLING 
-    for ev in pygame.event.get():                 # iterate over pending events
-        if ev.type == pygame.QUIT:                # window closed
-            pygame.quit(); sys.exit()
-        if ev.type == pygame.KEYDOWN:             # key pressed
-            if ev.key == pygame.K_ESCAPE and state == "game":  # pause hotkey
-                state = "paused"; pause_start = now; play_music(pause_music)
-            if ev.key == pygame.K_m:              # mute/unmute toggle
-                muted = not muted
-                mute_btn.txt = "Unmute" if muted else "Mute"
-                if muted: pygame.mixer.music.stop()
-        if ev.type == pygame.MOUSEBUTTONDOWN:     # mouse click
-            pos = ev.pos                          # click position
-            # Splash → Menu
-            if state == "logo":
-                click(); state = "menu"; play_music(menu_music)
-
-            # Main menu logic
-            elif state == "menu":
-                if start_btn.hit(pos):
-                    click(); player = Player(); enemies = spawn(1); stage = 1
-                    state = "game"; start_time = now; paused_time = 0
-                    play_music(stage_music[1])
-                elif settings_btn.hit(pos):
-                    click(); state = "settings_menu"
-                elif diff_btn.hit(pos):
-                    click(); diff_idx = (diff_idx+1) % 3; difficulty = DIFFS[diff_idx]
-                    diff_btn.txt = f"Difficulty: {difficulty}"; fit(diff_btn)
-                elif quit_btn.hit(pos):
-                    click(); pygame.quit(); sys.exit()
-
-            # Settings from main
-            elif state == "settings_menu":
-                if scheme_btn.hit(pos):
-                    click(); scheme_idx = (scheme_idx+1) % len(SCHEMES)
-                    scheme_btn.txt = f"Controls: {SCHEMES[scheme_idx]['name']}"; fit(scheme_btn, 200)
-                elif mute_btn.hit(pos):
-                    click(); muted = not muted; mute_btn.txt = "Unmute" if muted else "Mute"
-                    if muted: pygame.mixer.music.stop()
-                elif back_btn.hit(pos):
-                    click(); state = "menu"
-
-            # HUD pause button
-            elif state == "game" and pause_btn.hit(pos):
-                click(); state = "paused"; pause_start = now; play_music(pause_music)
-
-            # Pause menu buttons
-            elif state == "paused":
-                if resume_btn.hit(pos):
-                    click(); state = "game"; paused_time += now - pause_start
-                    play_music(stage_music[stage])
-                elif settings_in.hit(pos):
-                    click(); state = "settings_pause"
-                elif restart_btn.hit(pos):
-                    click(); player = Player(); enemies = spawn(1); stage = 1
-                    state = "game"; start_time = now; paused_time = 0; play_music(stage_music[1])
-                elif menu_btn.hit(pos):
-                    click(); state = "menu"; play_music(menu_music)
-                elif quit_game.hit(pos):
-                    click(); pygame.quit(); sys.exit()
-
-            # Settings during pause
-            elif state == "settings_pause":
-                if scheme_btn.hit(pos):
-                    click(); scheme_idx = (scheme_idx+1) % len(SCHEMES)
-                    scheme_btn.txt = f"Controls: {SCHEMES[scheme_idx]['name']}"; fit(scheme_btn, 200)
-                elif mute_btn.hit(pos):
-                    click(); muted = not muted; mute_btn.txt = "Unmute" if muted else "Mute"
-                    if muted: pygame.mixer.music.stop()
-                elif back_btn.hit(pos):
-                    click(); state = "paused"
-
-            # Victory / Game‑over screens
-            elif state in ("victory", "game_over"):
-                if restart_btn.hit(pos):
-                    click(); player = Player(); enemies = spawn(1); stage = 1
-                    state = "game"; start_time = now; paused_time = 0; play_music(stage_music[1])
-                elif menu_btn.hit(pos):
-                    click(); state = "menu"; play_music(menu_music)
-                elif quit_game.hit(pos):
-                    click(); pygame.quit(); sys.exit()
-
-    # Capture currently held keys (for movement & shooting)
-    keys = pygame.key.get_pressed()
-
-    #  SCREEN‑SPECIFIC UPDATES 
-
-    # Splash (logo) screen with timed fade effect
-    if state == "logo":
-        elapsed = now - logo_start
-        screen.blit(bg_menu, (0,0))
-        # compute alpha: fade in 0‑0.5s, solid 0.5‑1.5s, fade out 1.5‑2.5s
-        if elapsed < 500:
-            alpha = int(255 * elapsed / 500)
-        elif elapsed < 1500:
-            alpha = 255
-        else:
-            alpha = int(255 * max(0, 2500 - elapsed) / 1000)
-        blit_mid("SPACE SHAMBLERS", HEIGHT//2-40, 64, WHITE, alpha)
-        pygame.display.flip()
-        if elapsed >= 2500:                       # auto‑advance to menu
-            state = "menu"; play_music(menu_music)
-        continue                                  # skip rest of loop
-
-    # Settings screens (two contexts: from menu or from pause)
-    if state in ("settings_menu", "settings_pause"):
-        ensure_music(pause_music if state == "settings_pause" else menu_music)
-        bg_current = bg1 if stage==1 else bg2 if stage==2 else bg3
-        screen.blit(bg_menu if state=="settings_menu" else bg_current, (0,0))
-        if state == "settings_pause":
-            player.draw(); [e.draw() for e in enemies]      # show paused game behind menu
-        blit_mid("SETTINGS", HEIGHT//2 - 130, 48)
-        scheme_btn.draw(); mute_btn.draw(); back_btn.draw()
-        if state == "settings_pause":
-            secs = (now - start_time - paused_time) // 1000
-            timer = Font(None, 28).render(f"{secs//60:02}:{secs%60:02}", True, WHITE)
-            screen.blit(timer, (10,10))
-            hx = (WIDTH - player.hearts*30) // 2
-            for i in range(player.hearts): screen.blit(img_heart, (hx+i*30, 45))
-        pygame.display.flip(); continue
-
-    # Main menu
-    if state == "menu":
-        ensure_music(menu_music)
-        screen.blit(bg_menu, (0,0))
-        blit_mid("SPACE SHAMBLERS", HEIGHT//2 - 200, 48)
-        start_btn.draw(); settings_btn.draw(); diff_btn.draw(); quit_btn.draw()
-        pygame.display.flip(); continue
-
-    # Draw current background for game/pause
-    current_bg = bg1 if stage==1 else bg2 if stage==2 else bg3
-    screen.blit(current_bg, (0,0))
-
-    #  GAMEPLAY (not paused) 
-    if state == "game":
-        ensure_music(stage_music[stage])
-        player.move(keys)                          # handle movement
-        if keys[SCHEMES[scheme_idx]["shoot"]]:    # handle shooting
-            player.shoot()
-
-        # Update player lasers: move up & remove when off‑screen
-        for l in player.lasers[:]:                 # iterate over a copy
-            l.y -= LASER_SPEED
-            if l.y < 0: player.lasers.remove(l)
+def formation(n, difficulty):
+    """Synthetic spawn()‑style grid of *n* enemies (every 4th column zig‑zags) for stress tests."""
+    cols = (WIDTH - 80) // 45                     # 40 px sprites, 5 px gaps
+    rows = -(-n // cols)                          # ceiling division
+    dy   = min(60, (HEIGHT - 400) / rows)         # rows squeeze to stay in the enemy area
+    return [enemy_pool.get(40 + (i % cols) * 45, 80 + int((i // cols) * dy),
+                           2 if i % cols % 4 == 3 else 1, difficulty) for i in range(n)]
+
+
+#15. HEADLESS GAME SIMULATION                                                 
+
+class GameSimulation:
+    """All gameplay state and rules, advanced by step(); never draws or plays audio.
+    step() returns the names of what happened ("enemy_shot", "player_hit", …) for sound and music."""
+    def __init__(self, difficulty, seed=None):
+        self.shots   = ProjectilePool()              # every laser and orb in flight
+        self.grid    = SpatialHash()                 # spatial index over the current wave
+        self.enemies = []                            # current wave
+        self.fx      = []                            # (kind, x, y) effects of the last step
+        self.restart(difficulty, seed)
+
+    def restart(self, difficulty, seed=None):
+        """Start a new game at *difficulty*, reusing the pools of the previous one (random *seed* if None)."""
+        recorder.end(self)                           # save the game being abandoned with its own result
+        self.difficulty = difficulty                 # fixed for the whole run
+        self.seed    = random.getrandbits(32) if seed is None else seed
+        self.rng     = random.Random(self.seed)      # every random decision of this game
+        self.time    = 0                             # logical clock in ms (only runs while stepping)
+        self.player  = Player(difficulty)            # single player instance
+        self.shots.clear()
+        self.load_stage(1)                           # stage index, current wave & its spatial index
+        self.ability_msg  = None                     # power‑up banner text
+        self.ability_time = 0                        # logical time banner appeared
+        self.over    = None                          # None while playing, then "victory"/"game_over"
+        recorder.begin(self)
+
+    def load_stage(self, stage, enemies=None):
+        """Switch to *stage* with its spawn() wave (or *enemies*); the old wave's fire vanishes."""
+        enemy_pool.release(self.enemies)             # survivors of the old wave are recycled
+        self.stage   = stage
+        self.enemies = spawn(stage, self.difficulty) if enemies is None else enemies
+        self.grid.clear()
+        for i, en in enumerate(self.enemies):
+            en.idx = i; self.grid.insert(en, en.rect)
+        self.shots.clear(OWNER_ENEMY); self.shots.clear(OWNER_BOSS)
+
+    def _kill(self, en):
+        """Swap‑remove *en* from the wave in O(1) and hand it back to the pool."""
+        last = self.enemies.pop()
+        if last is not en:
+            self.enemies[en.idx] = last; last.idx = en.idx
+        self.grid.remove(en); enemy_pool.release((en,))
+
+    def step(self, inputs, dt):
+        """Advance the game by one tick of *dt* ms using *inputs*; return event names."""
+        self.time += dt
+        now, player, events = self.time, self.player, []
+        fx = self.fx; fx.clear()
+
+        player.move(inputs, dt)                      # handle movement
+        if inputs.shoot:                             # handle shooting
+            player.shoot(now, self.shots)
+        prof.mark("player")
+
+        # Move every projectile at once & cull the ones that left the screen
+        self.shots.step(dt)
+        prof.mark("projectiles")
 
         # Update enemies
-        for en in enemies[:]:
-            en.move(enemies)                       # zig‑zag movement (type 2)
-            en.shoot(player.rect)                  # maybe fire
-
-            # Enemy projectiles hit player
-            for proj in en.lasers[:]:
-                rect = pygame.Rect(proj[0]-6, proj[1]-6, 12, 12) if en.t == 3 else proj
-                if en.t == 3:                      # move boss orb
-                    proj[0] += proj[2]; proj[1] += proj[3]
-                else:
-                    proj.y += ENEMY_LASER          # move linear laser
-                if rect.colliderect(player.rect):  # collision test
-                    player.hearts -= en.dmg        # apply damage
-                    player.flash_until = now + 120 # brief flash effect
-                    en.lasers.remove(proj)         # delete projectile
-
-            # Player lasers hit enemy
-            for l in player.lasers[:]:
-                if l.colliderect(en.rect):
-                    en.hp -= 1; player.lasers.remove(l)       # damage enemy & remove laser
-                    if en.hp <= 0:                            # enemy destroyed
-                        enemies.remove(en)
-                        if not muted and snd_deathE: snd_deathE.play()
-                    break                                      # stop checking this laser
+        for en in self.enemies:
+            en.move(self.grid, dt)                   # zig‑zag movement (type 2)
+            if en.shoot(player.rect, now, self.shots, self.rng):  # maybe fire
+                events.append("boss_shot" if en.t == 3 else "enemy_shot")
+        prof.mark("enemies")
+
+        # Enemy projectiles hit player (one vectorised overlap test)
+        hits = self.shots.overlapping(player.rect, hostile=True)
+        if len(hits):
+            player.hearts -= int(self.shots.dmg[hits].sum())   # apply damage
+            player.flash_until = now + FLASH_MS                 # brief flash effect
+            fx.extend(("orb_hit" if o == OWNER_BOSS else "player_hit", *player.rect.center)
+                      for o in self.shots.owner[hits].tolist())
+            self.shots.release(hits)                            # projectiles are consumed
+            events.extend(["player_hit"] * len(hits))
+
+        # Player lasers hit enemy: each laser only tests enemies in the cells it overlaps
+        spent = []
+        for i in self.shots.active(OWNER_PLAYER):
+            l  = pygame.Rect(int(self.shots.x[i]), int(self.shots.y[i]), 4, 10)
+            en = next((e for e in self.grid.query(l) if l.colliderect(e.rect)), None)
+            if en is None:
+                continue
+            en.hp -= 1; spent.append(i)                       # damage enemy, laser is spent
+            en.flash_until = now + FLASH_MS                   # brief flash effect
+            if en.hp <= 0:                                    # enemy destroyed
+                self._kill(en); events.append("enemy_killed")
+                fx.append(("boss_explosion" if en.t == 3 else "explosion", *en.rect.center))
+            else:
+                fx.append(("spark", *l.midtop))
+        if spent:
+            self.shots.release(np.array(spent))
+        prof.mark("collisions")
 
         # Stage cleared when no enemies remain
-        if not enemies:
-            if stage == 1:                          # grant rapid‑fire power‑up
-                player.cool //= 2; ability_msg, ability_time = "Rapid Fire", now
-                if not muted and snd_power: snd_power.play()
-            elif stage == 2:                        # grant speed boost
-                player.speed *= 2; ability_msg, ability_time = "Hermes Boots", now
-                if not muted and snd_power: snd_power.play()
-            if stage < 3:                           # advance to next stage
-                stage += 1; enemies = spawn(stage); play_music(stage_music[stage])
-            else:                                   # game finished – victory
-                state = "victory"; play_music(gameover_music)
+        if not self.enemies:
+            if self.stage == 1:                      # grant rapid‑fire power‑up
+                player.cool //= 2; self.ability_msg, self.ability_time = "Rapid Fire", now
+                events.append("power_up")
+            elif self.stage == 2:                    # grant speed boost
+                player.speed *= 2; self.ability_msg, self.ability_time = "Hermes Boots", now
+                events.append("power_up")
+            if self.stage < 3:                       # advance to next stage
+                self.load_stage(self.stage + 1); events.append("stage")
+            else:                                    # game finished – victory
+                self.over = "victory"; events.append("victory")
 
         # Player death check
         if player.hearts <= 0:
-            if not muted and snd_deathP: snd_deathP.play()
-            state = "game_over"; play_music(gameover_music)
-
-    #  RENDER / DRAW PHASE 
-    player.draw(); [e.draw() for e in enemies]     # always draw actors (game & pause)
-
-    # HUD (timer, hearts, pause button)
-    if state in ("game", "paused"):
-        secs = (now - start_time - paused_time) // 1000
-        timer_surf = Font(None, 28).render(f"{secs//60:02}:{secs%60:02}", True, WHITE)
-        screen.blit(timer_surf, (10,10))
-        hx = (WIDTH - player.hearts*30) // 2
-        for i in range(player.hearts):
-            screen.blit(img_heart, (hx + i*30, 45))
-        if state == "game": pause_btn.draw()
-
-    # Ability banner (fade out after 3 seconds)
-    if ability_msg:
-        el = now - ability_time
-        if el < 3000:
-            alpha = int(255 * (1 - el / 3000))
-            blit_mid(f"New ability unlocked: {ability_msg}", HEIGHT//2 - 220, 32, YELL, alpha)
+            self.over = "game_over"; events.append("player_dead")
+        recorder.tick(self, inputs)
+        if self.over: recorder.end(self)
+        prof.mark("stage")
+        return events
+
+BOT_HORIZON = np.linspace(0, 0.6, 13)             # look‑ahead times (s) for the bot's dodging
+BOT_MARGIN  = 6                                   # px of clearance the bot keeps around its hit‑box
+
+def _bot_aim(en, top):
+    """x a laser fired now from height *top* should go up at to meet *en* (leading zig‑zaggers)."""
+    lead = en.dir * ZIGZAG_SPEED * (top - en.rect.bottom) / LASER_SPEED if en.t == 2 else 0
+    return en.rect.centerx + lead
+
+def bot_inputs(sim):
+    """Simple scripted policy: keep firing, line up under the nearest enemy and sidestep enemy fire."""
+    if not sim.enemies:
+        return NO_INPUT
+    p, s = sim.player, sim.shots
+    r, px = p.rect, p.rect.centerx
+    target = min((_bot_aim(e, r.top) for e in sim.enemies), key=lambda x: abs(x - px))
+    want = (target > px + 4) - (target < px - 4)  # -1 left, 0 stay, 1 right
+    move = want
+    reach = r.top - BOT_MARGIN - max(ENEMY_LASER, ORB_SPEED) * BOT_HORIZON[-1]   # enemy fire only falls
+    idx = np.flatnonzero(s.alive & (s.owner != OWNER_PLAYER) & (s.y > reach))
+    if len(idx):
+        t = BOT_HORIZON[:, None]                  # rows: time, columns: shot
+        sx, sy = s.x[idx] + s.vx[idx] * t, s.y[idx] + s.vy[idx] * t
+        level = (sy < r.bottom + BOT_MARGIN) & (sy + s.h[idx] > r.top - BOT_MARGIN)
+        latest = -1.0
+        for d in sorted((-1, 0, 1), key=lambda d: d != want):   # preferred move first
+            x = np.clip(r.x + d * p.speed * t, 0, WIDTH - r.w)
+            hit = (level & (sx < x + r.w + BOT_MARGIN) & (sx + s.w[idx] > x - BOT_MARGIN)).any(axis=1)
+            when = BOT_HORIZON[hit.argmax()] if hit.any() else math.inf
+            if when > latest:                     # the move hit latest (at best never) wins
+                move, latest = d, when
+    return Inputs(move < 0, move > 0, False, True, True)
+
+def run_headless(ticks, difficulty):
+    """Step simulations with bot_inputs for *ticks* ticks (restarting finished games) and report speed."""
+    sim, games, t0 = GameSimulation(difficulty), 1, time.perf_counter()
+    for _ in range(ticks):
+        sim.step(bot_inputs(sim), STEP_MS)
+        if sim.over:
+            sim.restart(difficulty); games += 1
+    el = time.perf_counter() - t0
+    print(f"[SIM] {ticks} ticks, {games} game(s) in {el:.2f} s ({ticks/max(el, 1e-9):.0f} ticks/s)")
+
+
+#16. INPUT RECORDING & REPLAY                                                 
+
+def input_bits(inp):
+    """Pack Inputs into an int (bit i = field i)."""
+    return sum(1 << i for i, v in enumerate(inp) if v)
+
+def bits_input(b):
+    return Inputs(*(bool(b >> i & 1) for i in range(len(Inputs._fields))))
+
+def game_result(sim):
+    """Summary of where *sim* stands, stored with a recording to verify its replay."""
+    return {"over": sim.over, "time": sim.time, "stage": sim.stage,
+            "hearts": sim.player.hearts, "enemies": len(sim.enemies)}
+
+class Recorder:
+    """Writes each game (seed, difficulty and run‑length encoded per‑tick inputs) as a JSON line;
+    does nothing when no file is given."""
+    def __init__(self, out_path=None):
+        self._file = None
+        self.game  = None                          # game being recorded (dict) or None
+        self.sim   = None                          # …and the simulation playing it
+        if out_path:
+            self._file = open(out_path, "w")
+            atexit.register(self.close)
+
+    def begin(self, sim):
+        """Start recording *sim* (closing the game recorded before, if any)."""
+        if self._file:
+            self.end(self.sim)
+            self.sim  = sim
+            self.game = {"seed": sim.seed, "difficulty": sim.difficulty, "inputs": []}
+
+    def tick(self, sim, inputs):
+        if self.game and sim is self.sim:
+            runs, b = self.game["inputs"], input_bits(inputs)
+            if runs and runs[-1][0] == b: runs[-1][1] += 1
+            else:                         runs.append([b, 1])
+
+    def end(self, sim):
+        """Write the game in progress (unless no tick of it was played) with *sim*'s result
+        (only if *sim* is the simulation being recorded)."""
+        if sim is not self.sim:
+            return
+        if self.game and self.game["inputs"]:
+            self.game["result"] = game_result(sim)
+            self._file.write(json.dumps(self.game, separators=(",", ":")) + "\n"); self._file.flush()
+        self.game = None
+
+    def close(self):
+        if self._file:
+            self.end(self.sim); self._file.close(); self._file = None
+
+recorder = Recorder(ARGS.record)                  # fed by GameSimulation.restart/step
+
+def run_replay(path, realtime=False):
+    """Replay every game in the recording *path*, uncapped without drawing or in the window at
+    normal speed; print how each went and return 1 if any ended differently from the recording."""
+    with open(path) as f:
+        games = [json.loads(line) for line in f if line.strip()]
+    differ = 0
+    for n, g in enumerate(games, 1):
+        sim   = GameSimulation(g["difficulty"], g["seed"])
+        ticks = [bits_input(b) for b, k in g["inputs"] for _ in range(k)]
+        t0    = time.perf_counter()
+        if realtime:
+            logic, it = FixedClock(), iter(ticks)
+            while it is not None:
+                for ev in pygame.event.get():
+                    if ev.type == pygame.QUIT: pygame.quit(); sys.exit()
+                steps = logic.steps(clock.tick(FPS)); prof.mark("wait")
+                for _ in range(steps):
+                    inp = next(it, None)
+                    if inp is None: it = None; break
+                    for name in sim.step(inp, STEP_MS):
+                        if name in EVENT_SFX: audio.play(*EVENT_SFX[name])
+                screen.blit(stage_bg[sim.stage].get(), (0,0))
+                draw_world(sim, logic.alpha); draw_hud(sim); prof.mark("draw"); present()
+                prof.frame(len(sim.enemies), len(sim.shots))   # one profiler row per frame…
+        else:
+            for inp in ticks:
+                sim.step(inp, STEP_MS)
+                prof.frame(len(sim.enemies), len(sim.shots))   # …or per tick when uncapped
+        el  = time.perf_counter() - t0
+        res = game_result(sim)
+        ok  = res == g.get("result", res)
+        differ += not ok
+        print(f"[REPLAY] game {n}: {len(ticks)} ticks in {el:.2f} s ({len(ticks)/max(el, 1e-9):.0f} ticks/s)"
+              f" → {res['over'] or 'unfinished'} at {res['time']/1000:.1f} s, stage {res['stage']}"
+              f" – {'matches the recording' if ok else 'DIFFERS from the recording ' + str(g['result'])}")
+    return 1 if differ else 0
+
+
+#17. RENDERING – VIEW OVER A SIMULATION                                       
+
+EVENT_SFX = {                                     # simulation event → (sound effect, channel category)
+    "enemy_shot":   (snd_e12,    "shots"),
+    "boss_shot":    (snd_boss,   "shots"),
+    "enemy_killed": (snd_deathE, "events"),
+    "power_up":     (snd_power,  "events"),
+    "player_dead":  (snd_deathP, "events"),
+}
+
+PARTICLE_FX = {                                   # effect kind → (particles, speed px/s, life ms, colour)
+    "explosion":      (24, 160, 600, (255, 160, 40)),
+    "boss_explosion": (90, 240, 900, (255, 120, 255)),
+    "spark":          (6,  120, 250, YELL),
+    "player_hit":     (14, 140, 400, RED),
+    "orb_hit":        (18, 120, 500, MAG),
+}
+PARTICLE_CAP, PARTICLE_BUDGET = 2048, 400          # live particles at most, new particles per frame at most
+PARTICLE_FADE = 4                                 # pre‑rendered opacity levels per kind
+
+class ParticlePool:
+    """Fixed‑size, purely cosmetic pool of particles for explosions, sparks and hit debris;
+    spawns at most PARTICLE_BUDGET a frame, and fewer of each effect while frames run late."""
+    FIELDS = (("x", np.float32), ("y", np.float32), ("vx", np.float32), ("vy", np.float32),
+              ("life", np.float32), ("ttl", np.float32),   # ms left / ms at spawn
+              ("kind", np.int8), ("alive", np.bool_))
+
+    def __init__(self, capacity=PARTICLE_CAP):
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype))
+        self.kinds  = list(PARTICLE_FX)
+        self.imgs   = [self._fade_levels(PARTICLE_FX[k][3]) for k in self.kinds]
+        self.rng    = np.random.default_rng()
+        self.rate   = 1.0                              # share of each effect spawned (0.1…1)
+        self.budget = PARTICLE_BUDGET                  # particles still allowed this frame
+
+    @staticmethod
+    def _fade_levels(colour):
+        out = []
+        for k in range(1, PARTICLE_FADE + 1):
+            img = pygame.Surface((3, 3)).convert()
+            img.fill(colour); img.set_alpha(255 * k // PARTICLE_FADE)
+            out.append(img)
+        return out
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    def frame(self, frame_ms):
+        """Start a frame that followed one of *frame_ms*: adapt the spawn rate, refill the budget."""
+        if frame_ms > 1250 / FPS: self.rate = max(0.1, self.rate * 0.7)    # running late → back off
+        else:                     self.rate = min(1.0, self.rate + 0.02)
+        self.budget = PARTICLE_BUDGET
+
+    def burst(self, kind, x, y):
+        """Scatter *kind*'s particles from (*x*, *y*), as many as rate, budget and free slots allow."""
+        n, speed, life, _ = PARTICLE_FX[kind]
+        free = np.flatnonzero(~self.alive)[:min(round(n * self.rate), self.budget)]
+        n = len(free)
+        if not n:
+            return
+        self.budget -= n
+        ang = self.rng.uniform(0, 2 * math.pi, n)
+        spd = self.rng.uniform(0.3, 1.0, n) * speed
+        self.x[free], self.y[free] = x, y
+        self.vx[free], self.vy[free] = np.cos(ang) * spd, np.sin(ang) * spd
+        self.life[free] = self.ttl[free] = self.rng.uniform(0.5, 1.0, n) * life
+        self.kind[free], self.alive[free] = self.kinds.index(kind), True
+
+    def step(self, dt):
+        """Move, slow down and age every particle by *dt* ms."""
+        k = dt / 1000
+        self.x += self.vx * k; self.y += self.vy * k
+        self.vx *= 1 - 2 * k; self.vy *= 1 - 2 * k   # drag
+        self.life -= dt
+        self.alive &= self.life > 0
+
+    def clear(self):
+        self.alive[:] = False
+
+    def blit_items(self):
+        """(surface, position) pairs for every live particle, fading with age."""
+        i = np.flatnonzero(self.alive)
+        lvl = np.minimum(PARTICLE_FADE - 1, (self.life[i] / self.ttl[i] * PARTICLE_FADE).astype(int))
+        imgs = self.imgs
+        return [(imgs[k][v], (x, y)) for k, v, x, y in zip(self.kind[i].tolist(), lvl.tolist(),
+                                                            self.x[i].astype(int).tolist(),
+                                                            self.y[i].astype(int).tolist())]
+
+particles = ParticlePool()                        # explosions & impacts (fed from GameSimulation.fx)
+
+def draw_world(sim, alpha=1.0):
+    """Draw the actors of *sim* *alpha* of the way into the next step (game, pause and settings
+    screens) in one batched blit; return areas drawn."""
+    items = [sim.player.blit_item(sim.time, alpha)]
+    items += [e.blit_item(sim.time, alpha) for e in sim.enemies]
+    items += sim.shots.blit_items(alpha)
+    items += particles.blit_items()
+    return screen.blits(items)
+
+class FixedClock:
+    """Turns variable frame times into a whole number of fixed logic steps (at most MAX_CATCHUP a frame);
+    the leftover is exposed as *alpha* (0…1) so drawing can interpolate between the last two steps."""
+    def __init__(self, step_ms=STEP_MS, max_steps=MAX_CATCHUP):
+        self.step_ms, self.max_steps = step_ms, max_steps
+        self.acc = 0.0                              # real time not yet simulated (ms)
+
+    def steps(self, frame_ms):
+        """Add *frame_ms* of real time; return how many logic steps to run now."""
+        self.acc += frame_ms
+        n = min(int(self.acc // self.step_ms), self.max_steps)
+        self.acc -= n * self.step_ms
+        if self.acc >= self.step_ms:                # capped → forget the backlog
+            self.acc %= self.step_ms
+        return n
+
+    @property
+    def alpha(self):
+        return self.acc / self.step_ms
+
+    def reset(self):
+        self.acc = 0.0
+
+def draw_hud(sim):
+    """Timer (active play time only) and heart icons; return areas drawn."""
+    secs = int(sim.time) // 1000
+    out  = [screen.blit(text_surf(f"{secs//60:02}:{secs%60:02}", 28), (10,10))]
+    hx = (WIDTH - sim.player.hearts*30) // 2
+    for i in range(sim.player.hearts):
+        out.append(screen.blit(img_heart, (hx + i*30, 45)))
+    return out
+
+class DirtyRects:
+    """Dirty‑rectangle presentation for the in‑game screen; other frames get a full repaint."""
+    def __init__(self, enabled=True):
+        self.enabled = enabled                     # False → always full blit + flip
+        self.last    = None                        # areas drawn last frame (None → repaint everything)
+        self.bg      = None                        # background those areas were drawn over
+
+    def begin(self, bg, gameplay):
+        """Prepare the back buffer over *bg*; return True if this frame can be presented partially."""
+        if self.enabled and gameplay and self.last is not None and bg is self.bg:
+            screen.blits([(bg, r, r) for r in self.last], doreturn=False)   # erase last frame's actors
+            return True
+        screen.blit(bg, (0,0)); self.bg = bg
+        return False
+
+    def end(self, rects, partial, gameplay):
+        """Present the frame; *rects* are this frame's drawn areas."""
+        box = present(list({tuple(r) for r in self.last + rects}) if partial   # old + new spots,
+                      else None)                                                # static actors once
+        self.last = (rects + [box] if box else rects) if gameplay else None
+
+
+#18. BENCHMARK SUITE (--bench)                                                
+
+BENCH_BASELINE = "bench_baseline.json"            # results stored by --bench-save
+BENCH_SEED     = 1234                             # every scenario replays the same random numbers
+
+try:
+    import resource                               # peak RSS (not available on Windows)
+except ImportError:
+    resource = None
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far in MB (None if unknown)."""
+    if resource is None:
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return kb / 1024 / (1024 if sys.platform == "darwin" else 1)    # macOS reports bytes
+
+def _bench_stage(stage):
+    """Scenario: *stage* as shipped with the bot at the controls."""
+    def setup():
+        sim = GameSimulation("Normal", BENCH_SEED)
+        if stage != 1: sim.load_stage(stage)
+        return sim, 0
+    return setup
+
+def _bench_swarm(n):
+    """Scenario: formation(n) plus *n* enemy lasers kept in flight."""
+    def setup():
+        sim = GameSimulation("Normal", BENCH_SEED)
+        sim.load_stage(1, formation(n, "Normal"))
+        return sim, n
+    return setup
+
+BENCH_SCENARIOS = (                               # name, setup, frames per repeat
+    ("stage1",     _bench_stage(1),    600),
+    ("boss",       _bench_stage(3),    600),
+    ("swarm-100",  _bench_swarm(100),  300),
+    ("swarm-500",  _bench_swarm(500),  100),
+    ("swarm-2000", _bench_swarm(2000),  20),
+)
+BENCH_REPEATS = 5                                 # fewest timed repeats per scenario
+BENCH_MIN_S   = 3.0                               # …and repeats go on until a scenario has run this long
+BENCH_RETRIES = 2                                 # a scenario that looks regressed is measured again this often
+
+def _bench_play(setup, frames, steps):
+    """Run one scenario for *frames* rendered frames; return each frame's time in ms."""
+    random.seed(BENCH_SEED)
+    particles.clear()
+    sim, fill = setup()
+    times = []
+    for _ in range(frames):
+        ft = time.perf_counter()
+        while len(sim.shots) < fill:              # keep the projectile load constant
+            sim.shots.spawn(random.uniform(0, WIDTH), random.uniform(0, HEIGHT - 300),
+                            0, ENEMY_LASER, 4, 10, OWNER_ENEMY)
+        particles.frame(1000 / FPS)
+        for _ in range(steps):
+            sim.player.hearts = 10**6              # player can't die, so every run sees the same load
+            sim.step(bot_inputs(sim), STEP_MS)
+            for kind, x, y in sim.fx: particles.burst(kind, x, y)
+            if sim.over: sim, fill = setup()       # bot cleared stage 3 – start over
+        particles.step(steps * STEP_MS)
+        sim.player.hearts = START_HEARTS["Normal"]         # HUD draws one icon per heart
+        screen.blit(stage_bg[sim.stage].get(), (0,0))
+        draw_world(sim); draw_hud(sim)
+        pygame.display.flip()
+        times.append((time.perf_counter() - ft) * 1000)
+    return times
+
+def _bench_heap_peak(setup, frames, steps):
+    """Most Python/NumPy memory (bytes) a short, untimed run of the scenario allocates."""
+    tracing = tracemalloc.is_tracing()
+    if not tracing: tracemalloc.start()
+    gc.collect(); tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    _bench_play(setup, frames, steps)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    if not tracing: tracemalloc.stop()
+    return peak
+
+def _bench_measure(setup, frames, steps):
+    """Warm up, then time repeats of one scenario; return its result row."""
+    peak = _bench_heap_peak(setup, max(10, frames // 10), steps)   # apart: tracemalloc slows the timed pass
+    _bench_play(setup, frames, steps)              # warm‑up: caches, pools, CPU clock
+    runs, start = [], time.perf_counter()
+    while len(runs) < BENCH_REPEATS or time.perf_counter() - start < BENCH_MIN_S:
+        runs.append(_bench_play(setup, frames, steps))
+    best  = [min(ft) for ft in zip(*runs)]         # the same frame replays each time: keep its fastest
+    times = [t for ft in runs for t in ft]
+    return {"ticks_per_s": round(frames * steps / (sum(best) / 1000), 1),
+            "median_ticks_per_s": round(percentile([frames * steps / (sum(ft) / 1000) for ft in runs], 50), 1),
+            "repeats": len(runs),
+            "p50_ms": round(percentile(times, 50), 3),
+            "p95_ms": round(percentile(times, 95), 3),
+            "p99_ms": round(percentile(times, 99), 3),
+            "peak_heap_mb": round(peak / 2**20, 2)}
+
+def run_bench(save=False, threshold=0.15):
+    """Run every scenario headless, print results, compare with the baseline; return an exit code."""
+    steps = max(1, round(LOGIC_HZ / FPS))         # logic steps per rendered frame
+    base = None
+    if not save:
+        try:
+            with open(BENCH_BASELINE) as f:
+                base = json.load(f)
+        except (OSError, ValueError):
+            print(f"[BENCH] no baseline at {BENCH_BASELINE} – run with --bench-save on this machine first")
+            return 1
+    results, failed = {}, []
+    for name, setup, frames in BENCH_SCENARIOS:
+        r = _bench_measure(setup, frames, steps)
+        for _ in range(BENCH_RETRIES if base and name in base else 0):
+            if r["ticks_per_s"] >= (1 - threshold) * base[name]["ticks_per_s"]:
+                break
+            print(f"[BENCH] {name:<11} {r['ticks_per_s']:>9.0f} ticks/s looks slow – measuring again")
+            r = max(r, _bench_measure(setup, frames, steps), key=lambda row: row["ticks_per_s"])
+        results[name] = r
+        print(f"[BENCH] {name:<11} {r['ticks_per_s']:>9.0f} ticks/s (median {r['median_ticks_per_s']:.0f})   frame p50 {r['p50_ms']:6.2f}"
+              f"  p95 {r['p95_ms']:6.2f}  p99 {r['p99_ms']:6.2f} ms   peak heap {r['peak_heap_mb']:6.2f} MB")
+
+    if save:
+        with open(BENCH_BASELINE, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[BENCH] baseline saved to {BENCH_BASELINE}")
+        return 0
+    for name, r in results.items():
+        if name not in base:
+            continue
+        ratio = r["ticks_per_s"] / base[name]["ticks_per_s"]
+        verdict = "FAIL" if ratio < 1 - threshold else "ok"
+        if verdict == "FAIL": failed.append(name)
+        print(f"[BENCH] {name:<11} {ratio:6.1%} of baseline  {verdict}")
+    if failed:
+        print(f"[BENCH] regression beyond {threshold:.0%} in: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+#19. BALANCING BATCH RUNNER (--batch)                                        
+
+BATCH_MAX_TICKS = LOGIC_HZ * 60 * 15              # a bot game still running after 15 minutes counts as lost
+
+def play_bot_game(job):
+    """Play one (difficulty, seed) game with bot_inputs in a worker process; return its statistics."""
+    difficulty, seed = job
+    sim = GameSimulation(difficulty, seed)
+    clears, damage = [], [0]                      # ms to clear each stage, hearts lost per stage
+    start, hearts = 0, sim.player.hearts
+    for _ in range(BATCH_MAX_TICKS):
+        events = sim.step(bot_inputs(sim), STEP_MS)
+        damage[-1] += hearts - sim.player.hearts; hearts = sim.player.hearts
+        if "stage" in events or "victory" in events:
+            clears.append(sim.time - start); start = sim.time
+            if "stage" in events: damage.append(0)
+        if sim.over:
+            break
+    return {"difficulty": difficulty, "seed": seed, "won": sim.over == "victory",
+            "time": sim.time, "clears": clears, "damage": damage}
+
+def _mean(values):
+    return round(sum(values) / len(values), 2) if values else None
+
+def batch_stats(games):
+    """Aggregate play_bot_game results into one row of statistics per difficulty."""
+    rows = []
+    for d in DIFFS:
+        g = [r for r in games if r["difficulty"] == d]
+        if not g:
+            continue
+        row = {"difficulty": d, "games": len(g),
+               "win_rate": round(sum(r["won"] for r in g) / len(g), 3),
+               "game_s": _mean([r["time"] / 1000 for r in g]),
+               "damage": _mean([sum(r["damage"]) for r in g])}
+        for st in (1, 2, 3):
+            row[f"stage{st}_reached"] = round(sum(len(r["damage"]) >= st for r in g) / len(g), 3)
+            row[f"stage{st}_clear_s"] = _mean([r["clears"][st-1] / 1000 for r in g if len(r["clears"]) >= st])
+            row[f"stage{st}_damage"]  = _mean([r["damage"][st-1] for r in g if len(r["damage"]) >= st])
+        rows.append(row)
+    return rows
+
+def run_batch(games, out_path=None, workers=None):
+    """Play *games* bot games per difficulty over a process pool; print (and save) the statistics."""
+    jobs = [(d, BENCH_SEED + i) for d in DIFFS for i in range(games)]   # same seeds for every difficulty
+    workers = workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(workers) as pool:        # one process per core – the GIL can't hold them back
+        results = list(pool.map(play_bot_game, jobs, chunksize=max(1, len(jobs) // (8 * workers))))
+    rows = batch_stats(results)
+    print(f"[BATCH] {len(jobs)} games on {workers} process(es) in {time.perf_counter() - t0:.1f} s")
+    for r in rows:
+        print(f"[BATCH] {r['difficulty']:<6} win {r['win_rate']:6.1%}   game {r['game_s']:6.1f} s"
+              f"   damage {r['damage']:5.2f}   clear s1/s2/s3 "
+              + " / ".join("  –  " if r[f"stage{st}_clear_s"] is None else f"{r[f'stage{st}_clear_s']:5.1f}"
+                           for st in (1, 2, 3)) + " s")
+    if out_path:
+        with open(out_path, "w", newline="") as f:
+            if out_path.lower().endswith(".csv"):
+                w = csv.DictWriter(f, fieldnames=list(rows[0])); w.writeheader(); w.writerows(rows)
+            else:
+                json.dump(rows, f, indent=2)
+        print(f"[BATCH] statistics saved to {out_path}")
+
+
+#20. TELEMETRY & SOAK TEST (--telemetry, --soak)                             
+
+TELEMETRY_EVERY_S = 30                            # seconds between samples in a normal session
+SOAK_SAMPLE_S     = 10                            # seconds between samples in a soak run
+SOAK_WARMUP       = 0.2                           # share of the run whose samples set the reference
+SOAK_RSS_SLACK_MB, SOAK_HEAP_SLACK_MB = 32, 8     # allowed growth after warm‑up
+SOAK_TICK_SLACK   = 2.0                           # allowed growth factor of the p95 tick time
+SOAK_MIN_SAMPLES  = 3                             # fewest samples in the warm‑up and after it for a verdict
+
+def rss_mb():
+    """Current resident memory in MB (peak on systems without /proc; None if unknown)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+def live_surfaces():
+    """Number of Surfaces referenced from Python objects (Surfaces aren't tracked by gc themselves)."""
+    return len({id(r) for o in gc.get_objects() for r in gc.get_referents(o) if type(r) is pygame.Surface})
+
+class Telemetry:
+    """Periodic snapshots of what tends to leak (actors, surfaces, caches, memory) as JSON lines to *out_path*;
+    tick() is called every frame and samples every *every_s* seconds."""
+    def __init__(self, out_path=None, every_s=TELEMETRY_EVERY_S):
+        self.every_s = every_s
+        self.t0      = time.perf_counter()
+        self.due     = self.t0 + every_s               # the first sample covers a full interval
+        self._file   = None
+        if out_path:
+            self._file = open(out_path, "a")
+            atexit.register(self.close)
+
+    def sample(self, sim):
+        """Take one sample of *sim* and the process now; return it as a dict."""
+        rss = rss_mb()
+        smp = {"t_s": round(time.perf_counter() - self.t0, 1),
+               "enemies": len(sim.enemies), "projectiles": len(sim.shots), "particles": len(particles),
+               "spare_enemies": len(enemy_pool.spare), "text_cache": len(_texts),
+               "surfaces": live_surfaces(), "rss_mb": rss and round(rss, 1)}
+        if tracemalloc.is_tracing():
+            smp["heap_mb"] = round(tracemalloc.get_traced_memory()[0] / 2**20, 2)
+            smp["top"] = [f"{st.traceback[0].filename.rsplit(os.sep, 1)[-1]}:{st.traceback[0].lineno} "
+                          f"{st.size // 1024} KB" for st in tracemalloc.take_snapshot().statistics("lineno")[:5]]
+        if self._file:
+            self._file.write(json.dumps(smp) + "\n"); self._file.flush()
+        return smp
+
+    def tick(self, sim):
+        """Sample *sim* if the interval has passed; return the sample or None."""
+        if time.perf_counter() < self.due:
+            return None
+        self.due += self.every_s
+        return self.sample(sim)
+
+    def close(self):
+        if self._file:
+            self._file.close(); self._file = None
+
+if ARGS.telemetry:
+    tracemalloc.start()                           # samples then carry heap_mb and the top allocation sites
+telemetry = ARGS.telemetry and Telemetry(ARGS.telemetry)   # sampled by the main loop (only with --telemetry)
+
+def run_soak(minutes, out_path=None):
+    """Loop bot games (drawn, restarted like restart_btn) for *minutes*; return 1 if memory or p95 tick
+    time grew past the SOAK_* limits over the warm‑up maxima (0 if too few samples to tell)."""
+    tracemalloc.start()
+    tel   = Telemetry(out_path, SOAK_SAMPLE_S)
+    steps = max(1, round(LOGIC_HZ / FPS))
+    sim, games, ticks, ref, worst = GameSimulation(difficulty), 1, [], {}, {}
+    n_ref = n_later = 0                               # samples taken during and after warm‑up
+    end   = time.perf_counter() + minutes * 60
+    warm  = time.perf_counter() + minutes * 60 * SOAK_WARMUP
+    while time.perf_counter() < end:
+        particles.frame(1000 / FPS)
+        for _ in range(steps):
+            t = time.perf_counter()
+            sim.step(bot_inputs(sim), STEP_MS)
+            ticks.append((time.perf_counter() - t) * 1000)
+            for kind, x, y in sim.fx: particles.burst(kind, x, y)
+            if sim.over:
+                sim.restart(difficulty); particles.clear(); games += 1   # as the Restart button
+                break
+        particles.step(steps * STEP_MS)
+        screen.blit(stage_bg[sim.stage].get(), (0,0))
+        draw_world(sim); draw_hud(sim)
+        pygame.display.flip()
+        if time.perf_counter() < tel.due:
+            continue
+        smp = tel.tick(sim)                             # kept: the last one is reported on failure
+        smp["tick_p95_ms"] = round(percentile(ticks, 95), 4); ticks = []
+        print(f"[SOAK] {smp['t_s']/60:6.1f} min  games {games:<4} enemies {smp['enemies']:<3}"
+              f" shots {smp['projectiles']:<4} particles {smp['particles']:<4} surfaces {smp['surfaces']:<4}"
+              f" rss {smp['rss_mb']} MB  heap {smp['heap_mb']} MB  tick p95 {smp['tick_p95_ms']:.3f} ms")
+        in_warmup = time.perf_counter() < warm          # warm‑up covers every stage a few times
+        seen = ref if in_warmup else worst
+        n_ref, n_later = n_ref + in_warmup, n_later + (not in_warmup)
+        for k in ("rss_mb", "heap_mb", "tick_p95_ms", "surfaces"):
+            if smp[k] is not None: seen[k] = max(seen.get(k, smp[k]), smp[k])
+    tracemalloc.stop()
+    if min(n_ref, n_later) < SOAK_MIN_SAMPLES:
+        print(f"[SOAK] inconclusive: {n_ref} warm‑up and {n_later} later samples, {SOAK_MIN_SAMPLES} of each"
+              f" needed – run for at least {SOAK_MIN_SAMPLES * SOAK_SAMPLE_S / SOAK_WARMUP / 60:g} minutes")
+        return 0
+    limits = {"heap_mb":     ref["heap_mb"] + SOAK_HEAP_SLACK_MB,
+              "tick_p95_ms": ref["tick_p95_ms"] * SOAK_TICK_SLACK}
+    if "rss_mb" in ref:
+        limits["rss_mb"] = ref["rss_mb"] + SOAK_RSS_SLACK_MB
+    failed = [k for k, lim in limits.items() if k in worst and worst[k] > lim]
+    for k, lim in limits.items():
+        print(f"[SOAK] {k:<12} warm‑up max {ref[k]}  later max {worst.get(k)}  limit {lim:.3f}"
+              f"  {'FAIL' if k in failed else 'ok'}")
+    print(f"[SOAK] surfaces: warm‑up max {ref['surfaces']}, later max {worst['surfaces']}")
+    if failed:
+        print("[SOAK] top allocation sites at the last sample:", *smp["top"], sep="\n    ")
+    return 1 if failed else 0
+
+
+#21. MAIN LOOP                                                                
+
+STATIC_STATES = ("menu", "settings_menu", "paused", "settings_pause", "victory", "game_over")
+IDLE_WAIT_MS  = 250                               # longest sleep on a static screen (F3 overlay refresh)
+
+def main():
+    global diff_idx, difficulty, scheme_idx
+    atexit.register(pacer.report)                     # latency & jitter summary on quit
+    state = "logo"                                   # current top‑level screen
+    logo_start = pygame.time.get_ticks()              # timestamp for splash fade
+    sim = GameSimulation(difficulty)                  # gameplay state (replaced on start/restart)
+    dirty = DirtyRects(not ARGS.full_flip)            # partial screen updates during play
+    logic = FixedClock()                              # fixed‑rate simulation steps
+    scene = None                                      # stage whose assets are loaded (None → menus)
+    shown = None                                      # static screen currently on display (None → redraw)
+
+    while True:
+        prof.frame(len(sim.enemies), len(sim.shots))  # close last frame's timings
+        if telemetry: telemetry.tick(sim)             # leak‑hunting samples (every 30 s, --telemetry)
+        if state == shown:                            # static screen already up – sleep until input
+            ev = pygame.event.wait(IDLE_WAIT_MS)
+            events = ([] if ev.type == pygame.NOEVENT else [ev]) + pygame.event.get()
+            clock.tick(); pacer.resync(); dt = 0      # time spent asleep is no game time
+            prof.discard()                            # …nor a frame for the profiler
+        elif ARGS.low_latency:
+            dt = pacer.wait()                         # precise pacing, frame starts late
+            events = pygame.event.get()
         else:
-            ability_msg = None
-
-    # Overlay menus (pause/victory/death)
-    if state == "paused":
-        blit_mid("PAUSED", HEIGHT//2 - 170, 60)
-        resume_btn.draw(); settings_in.draw(); restart_btn.draw(); menu_btn.draw(); quit_game.draw()
-    if state == "victory":
-        blit_mid("VICTORY!", HEIGHT//2 - 170, 60, GREEN)
-        restart_btn.draw(); menu_btn.draw(); quit_game.draw()
-    if state == "game_over":
-        blit_mid("GAME OVER", HEIGHT//2 - 170, 60, RED)
-        restart_btn.draw(); menu_btn.draw(); quit_game.draw()
-
-    pygame.display.flip()                          # push frame to the screen
-
-    # The Actual code for the game is 400 lines roughly but because of the spacing for more clearnce and better reading and understanding of the code is why there is so many lines
\ No newline at end of file
+            dt = clock.tick(FPS)                      # delay to keep FPS; also yields delta time (ms)
+            events = pygame.event.get()
+        prof.mark("wait")
+        now = pygame.time.get_ticks()                 # current time in ms
+
+        #  EVENT HANDLING 
+        for ev in events:                             # iterate over pending events
+            if ev.type == pygame.QUIT:                # window closed
+                pygame.quit(); sys.exit()
+            if ev.type == pygame.KEYDOWN:             # key pressed
+                if ev.key == pygame.K_ESCAPE and state == "game":  # pause hotkey
+                    state = "paused"; audio.music(pause_music, hold=True)
+                if ev.key == pygame.K_F3:             # profiler overlay toggle
+                    prof.visible = not prof.visible
+                if ev.key == pygame.K_m:              # mute/unmute toggle
+                    audio.set_muted(not audio.muted)
+                    mute_btn.txt = "Unmute" if audio.muted else "Mute"
+            if ev.type == pygame.MOUSEBUTTONDOWN:     # mouse click
+                pos = game_pos(ev.pos)                # click position
+                # Splash → Menu
+                if state == "logo":
+                    click(); state = "menu"; audio.music(menu_music)
+
+                # Main menu logic
+                elif state == "menu":
+                    if start_btn.hit(pos):
+                        click(); sim.restart(difficulty); particles.clear()
+                        state = "game"; audio.music(stage_music[1])
+                    elif settings_btn.hit(pos):
+                        click(); state = "settings_menu"
+                    elif diff_btn.hit(pos):
+                        click(); diff_idx = (diff_idx+1) % 3; difficulty = DIFFS[diff_idx]
+                        diff_btn.txt = f"Difficulty: {difficulty}"; fit(diff_btn)
+                    elif quit_btn.hit(pos):
+                        click(); pygame.quit(); sys.exit()
+
+                # Settings from main
+                elif state == "settings_menu":
+                    if scheme_btn.hit(pos):
+                        click(); scheme_idx = (scheme_idx+1) % len(SCHEMES)
+                        scheme_btn.txt = f"Controls: {SCHEMES[scheme_idx]['name']}"; fit(scheme_btn, 200)
+                    elif mute_btn.hit(pos):
+                        click(); audio.set_muted(not audio.muted)
+                        mute_btn.txt = "Unmute" if audio.muted else "Mute"
+                    elif back_btn.hit(pos):
+                        click(); state = "menu"
+
+                # HUD pause button
+                elif state == "game" and pause_btn.hit(pos):
+                    click(); state = "paused"; audio.music(pause_music, hold=True)
+
+                # Pause menu buttons
+                elif state == "paused":
+                    if resume_btn.hit(pos):
+                        click(); state = "game"
+                        audio.music(stage_music[sim.stage], resume=True)   # carries on where it paused
+                    elif settings_in.hit(pos):
+                        click(); state = "settings_pause"
+                    elif restart_btn.hit(pos):
+                        click(); sim.restart(difficulty); particles.clear()
+                        state = "game"; audio.music(stage_music[1])
+                    elif menu_btn.hit(pos):
+                        click(); state = "menu"; audio.music(menu_music)
+                    elif quit_game.hit(pos):
+                        click(); pygame.quit(); sys.exit()
+
+                # Settings during pause
+                elif state == "settings_pause":
+                    if scheme_btn.hit(pos):
+                        click(); scheme_idx = (scheme_idx+1) % len(SCHEMES)
+                        scheme_btn.txt = f"Controls: {SCHEMES[scheme_idx]['name']}"; fit(scheme_btn, 200)
+                    elif mute_btn.hit(pos):
+                        click(); audio.set_muted(not audio.muted)
+                        mute_btn.txt = "Unmute" if audio.muted else "Mute"
+                    elif back_btn.hit(pos):
+                        click(); state = "paused"
+
+                # Victory / Game‑over screens
+                elif state in ("victory", "game_over"):
+                    if restart_btn.hit(pos):
+                        click(); sim.restart(difficulty); particles.clear()
+                        state = "game"; audio.music(stage_music[1])
+                    elif menu_btn.hit(pos):
+                        click(); state = "menu"; audio.music(menu_music)
+                    elif quit_game.hit(pos):
+                        click(); pygame.quit(); sys.exit()
+
+        # Static screens only change on input (mouse motion alone changes nothing on them)
+        if state == shown and not prof.visible and all(ev.type == pygame.MOUSEMOTION for ev in events):
+            continue
+        shown = state if state in STATIC_STATES else None
+
+        # Capture currently held keys (for movement & shooting)
+        keys = pygame.key.get_pressed()
+        pacer.input_sampled()
+        at = None if state in ("logo", "menu", "settings_menu") else sim.stage
+        if at != scene:                               # prefetch next stage, drop unreachable ones
+            scene = at; want_assets(scene)
+        prof.mark("events")
+
+        #  SCREEN‑SPECIFIC UPDATES 
+
+        # Splash (logo) screen with timed fade effect
+        if state == "logo":
+            elapsed = now - logo_start
+            screen.blit(bg_menu, (0,0))
+            # compute alpha: fade in 0‑0.5s, solid 0.5‑1.5s, fade out 1.5‑2.5s
+            if elapsed < 500:
+                alpha = int(255 * elapsed / 500)
+            elif elapsed < 1500:
+                alpha = 255
+            else:
+                alpha = int(255 * max(0, 2500 - elapsed) / 1000)
+            blit_mid("SPACE SHAMBLERS", HEIGHT//2-40, 64, WHITE, alpha)
+            prof.mark("draw"); present()
+            if elapsed >= 2500:                       # auto‑advance to menu
+                state = "menu"; audio.music(menu_music)
+            continue                                  # skip rest of loop
+
+        # Settings screens (two contexts: from menu or from pause)
+        if state in ("settings_menu", "settings_pause"):
+            screen.blit(bg_menu if state=="settings_menu" else stage_bg[sim.stage].get(), (0,0))
+            if state == "settings_pause":
+                draw_world(sim)                       # show paused game behind menu
+            blit_mid("SETTINGS", HEIGHT//2 - 130, 48)
+            scheme_btn.draw(); mute_btn.draw(); back_btn.draw()
+            if state == "settings_pause":
+                draw_hud(sim)
+            prof.mark("draw"); present(); continue
+
+        # Main menu
+        if state == "menu":
+            screen.blit(bg_menu, (0,0))
+            blit_mid("SPACE SHAMBLERS", HEIGHT//2 - 200, 48)
+            start_btn.draw(); settings_btn.draw(); diff_btn.draw(); quit_btn.draw()
+            prof.mark("draw"); present(); continue
+
+        # Draw current background for game/pause (only last frame's actor areas when possible)
+        partial = dirty.begin(stage_bg[sim.stage].get(), state == "game")
+        prof.mark("draw")
+
+        #  GAMEPLAY (not paused) – fixed‑rate logic steps, however long the frame took
+        if state == "game":
+            inputs = read_inputs(keys)
+            particles.frame(dt)
+            for _ in range(logic.steps(dt)):
+                for name in sim.step(inputs, STEP_MS):
+                    if name in EVENT_SFX: audio.play(*EVENT_SFX[name])
+                    if name == "stage": audio.music(stage_music[sim.stage])
+                for kind, x, y in sim.fx: particles.burst(kind, x, y)
+                if sim.over:                          # victory or player death
+                    state = sim.over; audio.music(gameover_music)
+                    break
+            particles.step(dt)
+        if state != "game":
+            logic.reset()                             # paused time is never simulated
+
+        #  RENDER / DRAW PHASE 
+        drawn = draw_world(sim, logic.alpha)          # always draw actors (game & pause)
+        prof.mark("draw")
+
+        # HUD (timer, hearts, pause button)
+        if state in ("game", "paused"):
+            drawn += draw_hud(sim)
+            if state == "game": drawn.append(pause_btn.draw())
+
+        # Ability banner (fade out after 3 seconds of play)
+        if sim.ability_msg:
+            el = sim.time - sim.ability_time
+            if el < 3000:
+                alpha = int(255 * (1 - el / 3000))
+                drawn.append(blit_mid(f"New ability unlocked: {sim.ability_msg}", HEIGHT//2 - 220, 32, YELL, alpha))
+            else:
+                sim.ability_msg = None
+
+        # Overlay menus (pause/victory/death)
+        if state == "paused":
+            blit_mid("PAUSED", HEIGHT//2 - 170, 60)
+            resume_btn.draw(); settings_in.draw(); restart_btn.draw(); menu_btn.draw(); quit_game.draw()
+        if state == "victory":
+            drawn.append(blit_mid("VICTORY!", HEIGHT//2 - 170, 60, GREEN))
+            drawn += [restart_btn.draw(), menu_btn.draw(), quit_game.draw()]
+        if state == "game_over":
+            drawn.append(blit_mid("GAME OVER", HEIGHT//2 - 170, 60, RED))
+            drawn += [restart_btn.draw(), menu_btn.draw(), quit_game.draw()]
+
+        prof.mark("hud")
+        dirty.end(drawn, partial, state == "game")     # push frame (or just its changed areas)
+
+if __name__ == "__main__":
+    if ARGS.bench:
+        sys.exit(run_bench(ARGS.bench_save, ARGS.bench_threshold))
+    elif ARGS.soak:
+        sys.exit(run_soak(ARGS.soak, ARGS.telemetry))
+    elif ARGS.batch:
+        run_batch(ARGS.batch, ARGS.batch_out)
+    elif ARGS.replay:
+        sys.exit(run_replay(ARGS.replay, ARGS.replay_realtime))
+    elif ARGS.headless:
+        run_headless(ARGS.headless, difficulty)
+    else:
+        main()